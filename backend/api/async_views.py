@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import URLPattern
+
+from api.middleware import instrument_queries
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+ASYNC_READ_ROUTES = (
+    'tag-list', 'tag-detail',
+    'ingredient-list', 'ingredient-detail',
+    'recipe-list', 'recipe-detail', 'recipe-similar',
+)
+
+_executor = None
+
+
+def get_executor():
+    """
+    Отдельный ограниченный пул потоков для ORM: размер пула ограничивает
+    и число одновременных запросов к БД, и число соединений.
+    """
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_DB_WORKERS,
+            thread_name_prefix='orm'
+        )
+    return _executor
+
+
+def _call_view(view, request, *args, **kwargs):
+    close_old_connections()
+
+    with instrument_queries(request):
+        response = view(request, *args, **kwargs)
+
+        if callable(getattr(response, 'render', None)):
+            response.render()
+    return response
+
+
+def async_read_view(view):
+    """
+    Асинхронная обертка синхронного представления: чтения выполняются
+    в пуле ORM, не занимая event loop и общий поток sync_to_async;
+    изменения выполняются как обычные синхронные представления.
+    """
+
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            call = sync_to_async(
+                _call_view, thread_sensitive=False, executor=get_executor()
+            )
+        else:
+            call = sync_to_async(_call_view)
+        return await call(view, request, *args, **kwargs)
+
+    wrapper.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    return wrapper
+
+
+def with_async_reads(patterns, names=ASYNC_READ_ROUTES):
+    """
+    Заменяет представления маршрутов names на асинхронные обертки.
+    """
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_read_view(pattern.callback),
+            pattern.default_args,
+            pattern.name
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in patterns
+    ]
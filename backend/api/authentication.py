@@ -0,0 +1,123 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from recipes.versions import bump_versions, get_versions
+
+AUTH_VERSION = 'auth:{}'
+
+
+def copy_credentials(credentials):
+    """
+    Копия (пользователь, токен) для одного запроса: представление может
+    изменить пользователя, не сохранив его, и эти изменения не должны
+    попасть в кеш и в запросы других потоков.
+    """
+    user, token = credentials
+    user, token = copy.copy(user), copy.copy(token)
+    token.user = user
+    return user, token
+
+
+class TokenUserCache:
+    """
+    Ограниченный LRU-кеш процесса: ключ токена -> (пользователь, токен).
+    Записи живут не дольше ttl секунд и сверяются с общей меткой версии
+    пользователя, поэтому отзыв токена в одном процессе сразу
+    действует и в остальных.
+    """
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            if entry['expires'] < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+        if get_user_version(entry['credentials'][0].pk) != entry['version']:
+            self.discard(key)
+            return None
+
+        return copy_credentials(entry['credentials'])
+
+    def set(self, key, credentials, version):
+        credentials = copy_credentials(credentials)
+
+        with self._lock:
+            self._entries[key] = {
+                'credentials': credentials,
+                'version': version,
+                'expires': time.monotonic() + self.ttl
+            }
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key in [
+                key for key, entry in self._entries.items()
+                if entry['credentials'][0].pk == user_id
+            ]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_user_version(user_id):
+    return get_versions(AUTH_VERSION.format(user_id))[0]
+
+
+def invalidate_user(user_id):
+    token_cache.discard_user(user_id)
+    bump_versions(AUTH_VERSION.format(user_id))
+
+
+token_cache = TokenUserCache(
+    settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication без запроса Token ⋈ CustomUser на каждый вызов:
+    проверенные токены берутся из token_cache. Метка версии читается
+    после загрузки токена, так что отзыв, совпавший с этой загрузкой,
+    может не заметиться до истечения TTL записи.
+    """
+
+    def authenticate_credentials(self, key):
+        if not token_cache.size:
+            return super().authenticate_credentials(key)
+
+        credentials = token_cache.get(key)
+
+        if credentials is not None:
+            return credentials
+
+        credentials = super().authenticate_credentials(key)
+        token_cache.set(key, credentials, get_user_version(credentials[0].pk))
+        return credentials
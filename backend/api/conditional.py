@@ -0,0 +1,113 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, parse_http_date_safe
+from django.views.decorators.http import condition
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.versions import get_versions
+
+
+def _digest(*values):
+    return hashlib.md5(':'.join(map(repr, values)).encode()).hexdigest()
+
+
+def versioned_condition(*names, per_user=False, key=None, extra=None):
+    """
+    Условный GET (ETag / Last-Modified / 304) по меткам версий.
+
+    Имена коллекций могут ссылаться на аргументы URL: 'recipe:{pk}'.
+    При per_user в метку входит версия запросившего пользователя
+    (избранное, корзина, подписки). Если задан key, ETag начинается
+    с хеша версии самого объекта: по этой части versioned_precondition
+    проверяет If-Match, не завися от остальных меток. Функция extra
+    добавляет имена, зависящие от запроса.
+    """
+
+    def get_names(request, kwargs):
+        result = [name.format(**kwargs) for name in names]
+        if extra is not None:
+            result.extend(extra(request))
+        if per_user and request.user.is_authenticated:
+            result.append(f'user:{request.user.pk}')
+        return result
+
+    def etag_func(request, *args, **kwargs):
+        versions = get_versions(*get_names(request, kwargs))
+        viewer = request.user.pk if per_user else None
+        etag = _digest(viewer, *versions)
+        if key is not None:
+            etag = f'{_digest(*get_versions(key.format(**kwargs)))}.{etag}'
+        return etag
+
+    def last_modified_func(request, *args, **kwargs):
+        return datetime.fromtimestamp(
+            max(get_versions(*get_names(request, kwargs))), tz=timezone.utc
+        )
+
+    def decorator(view_func):
+        conditional_view = condition(
+            etag_func=etag_func, last_modified_func=last_modified_func
+        )(view_func)
+
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            if per_user:
+                patch_cache_control(response, private=True)
+                patch_vary_headers(response, ('Authorization',))
+            return response
+
+        return inner
+
+    return decorator
+
+
+def _version_part(etag):
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    return etag.strip('"').split('.')[0]
+
+
+def versioned_precondition(key):
+    """
+    If-Match и If-Unmodified-Since для изменения объекта: сравнивается
+    только версия key (например, 'recipe:{pk}'), поэтому правки тегов,
+    профилей или избранного не мешают сохранить объект. If-Match
+    принимает ETag, выданный versioned_condition с тем же key, в том
+    числе ослабленный при сжатии ответа (W/"..."): сравнивается метка
+    версии, а не байты представления, поэтому слабое сравнение здесь
+    достаточно.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            version, = get_versions(key.format(**kwargs))
+            if_match = request.META.get('HTTP_IF_MATCH')
+            if_unmodified_since = parse_http_date_safe(
+                request.META.get('HTTP_IF_UNMODIFIED_SINCE', '')
+            )
+
+            if if_match is not None:
+                current = _digest(version)
+                etags = parse_etags(if_match)
+                matched = etags == ['*'] or any(
+                    _version_part(etag) == current for etag in etags
+                )
+            elif if_unmodified_since is not None:
+                matched = int(version) <= if_unmodified_since
+            else:
+                matched = True
+
+            if not matched:
+                return Response(status=status.HTTP_412_PRECONDITION_FAILED)
+            return view_func(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
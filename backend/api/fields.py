@@ -0,0 +1,42 @@
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from recipes.images import variant_name
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Картинка рецепта: принимает base64, а отдает ссылку на вариант
+    нужного размера, если он уже создан, иначе на оригинал.
+    При list_only вариант используется только в списках.
+    """
+
+    def __init__(self, variant=None, list_only=False, **kwargs):
+        self.variant = variant
+        self.list_only = list_only
+        super().__init__(**kwargs)
+
+    def get_variant(self):
+        if self.list_only and not isinstance(
+            self.parent.parent, serializers.ListSerializer
+        ):
+            return None
+        return self.variant
+
+    def to_representation(self, value):
+        variant = self.get_variant()
+
+        if (
+            not value
+            or variant is None
+            or value.instance.variants_source != value.name
+        ):
+            return super().to_representation(value)
+
+        url = value.storage.url(variant_name(value.name, variant))
+        request = self.context.get('request')
+
+        if request is not None:
+            return request.build_absolute_uri(url)
+
+        return url
@@ -1,21 +1,21 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
+from rest_framework.filters import OrderingFilter
 
-from recipes.models import Ingredient, Recipe, Tag
-
-
-class CustomIngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ['name']
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from recipes.search import search
 
 
 class CustomRecipeFilter(FilterSet):
+    """
+    Фильтры построены на подзапросах EXISTS: соединения с таблицами
+    тегов, избранного и корзин не размножают строки и не требуют DISTINCT.
+    """
     tags = filters.ModelMultipleChoiceFilter(
         queryset=Tag.objects.all(),
         field_name='tags__slug',
-        to_field_name='slug'
+        to_field_name='slug',
+        method='filter_tags'
     )
     is_favorited = filters.BooleanFilter(
         method='check_is_favorite'
@@ -23,17 +23,53 @@ class CustomRecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='check_is_in_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['tags', 'author', 'is_favorited', 'is_in_shopping_cart']
+        fields = [
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart', 'search'
+        ]
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value
+        )))
+
+    def filter_search(self, queryset, name, value):
+        return search(queryset, value)
+
+    def filter_by_user(self, queryset, model):
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        return queryset.filter(Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        )))
 
     def check_is_favorite(self, queryset, name, value):
         if value:
-            return queryset.filter(favorites__user=self.request.user)
+            return self.filter_by_user(queryset, Favorite)
         return queryset
 
     def check_is_in_cart(self, queryset, name, value):
         if value:
-            return queryset.filter(shopping_carts__user=self.request.user)
+            return self.filter_by_user(queryset, ShoppingCart)
         return queryset
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """
+    Сортировка по счетчикам популярности; при равенстве значений
+    рецепты упорядочиваются как по умолчанию.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+
+        if ordering:
+            return [*ordering, *Recipe._meta.ordering, '-id']
+
+        return ordering
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.response_cache import recipe_list_cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кеша списка рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить счетчики'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.RESPONSE_CACHE_STATS:
+            self.stdout.write(self.style.WARNING(
+                'Счетчики не ведутся: включите RESPONSE_CACHE_STATS'
+            ))
+        stats = recipe_list_cache.get_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+
+        self.stdout.write(
+            f'Попадания: {stats["hits"]}, промахи: {stats["misses"]}, '
+            f'доля попаданий: {ratio:.1%}'
+        )
+
+        if options['reset']:
+            recipe_list_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Счетчики обнулены'))
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BROTLI_QUALITY = 5
+
+logger = logging.getLogger('api.sql')
+
+
+def instrument_queries(request):
+    """
+    Подключает счетчик SQL запроса request к соединениям текущего потока.
+    Нужен представлениям, которые выполняются в другом потоке (пул ORM
+    асинхронных чтений): у каждого потока свои объекты соединений.
+    """
+    stack = ExitStack()
+    wrapper = getattr(request, 'sql_execute_wrapper', None)
+
+    if wrapper is not None:
+        for connection in connections.all():
+            if wrapper not in connection.execute_wrappers:
+                stack.enter_context(connection.execute_wrapper(wrapper))
+    return stack
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Считает SQL-запросы и их время на каждый запрос, находит повторяющиеся
+    запросы (признак N+1), добавляет заголовок Server-Timing и пишет в лог
+    запросы, превысившие бюджет по времени или количеству запросов.
+
+    Добавляется в MIDDLEWARE только при включенной настройке
+    SQL_INSTRUMENTATION, иначе накладных расходов нет. Работает
+    и в асинхронной цепочке: счетчик подключается к соединениям потока,
+    в котором Django выполняет синхронные представления запроса.
+    Запросы, выполненные при отдаче потокового ответа, не учитываются.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        statements, durations = self.track(request)
+        started = time.perf_counter()
+        with instrument_queries(request):
+            response = self.get_response(request)
+        return self.report(request, response, statements, durations, started)
+
+    async def __acall__(self, request):
+        statements, durations = self.track(request)
+        started = time.perf_counter()
+        queries = await sync_to_async(instrument_queries)(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.close)()
+        return self.report(request, response, statements, durations, started)
+
+    @staticmethod
+    def track(request):
+        """
+        Создает счетчики запросов и сохраняет в request обертку,
+        которая их заполняет.
+        """
+        statements = Counter()
+        durations = []
+
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                durations.append(time.perf_counter() - started)
+                statements[sql] += 1
+
+        request.sql_execute_wrapper = wrapper
+        return statements, durations
+
+    @staticmethod
+    def report(request, response, statements, durations, started):
+        total = (time.perf_counter() - started) * 1000
+
+        db_time = sum(durations) * 1000
+        count = len(durations)
+        repeated = {
+            sql: times for sql, times in statements.items() if times > 1
+        }
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={db_time:.1f};desc="{count} queries"',
+            f'db-repeated;desc="{len(repeated)} repeated"',
+            f'total;dur={total:.1f}',
+        ])
+
+        if (
+            total > settings.SQL_LATENCY_BUDGET_MS
+            or count > settings.SQL_QUERY_BUDGET
+            or max(repeated.values(), default=0)
+            >= settings.SQL_REPEATED_QUERY_BUDGET
+        ):
+            match = request.resolver_match
+            logger.warning(
+                '%s %s (%s): %.1f ms, %d queries, %.1f ms in db%s',
+                request.method,
+                request.path,
+                match.view_name if match else '-',
+                total,
+                count,
+                db_time,
+                ''.join(
+                    f'\n  {times}x {sql}'
+                    for sql, times in Counter(repeated).most_common(3)
+                )
+            )
+
+        return response
+
+
+def _accepted_encodings(header):
+    """
+    Кодировки из Accept-Encoding, не отключенные через q=0.
+    """
+    encodings = set()
+
+    for item in header.split(','):
+        name, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        if name and quality > 0:
+            encodings.add(name.lower())
+
+    return encodings
+
+
+def _brotli_sequence(sequence):
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы br (если установлен brotli) или gzip по Accept-Encoding.
+    Ответы короче COMPRESSION_MIN_SIZE не сжимаются: выигрыш меньше
+    накладных расходов. Как и GZipMiddleware, делает ETag слабым,
+    а потоковые ответы сжимает по мере отдачи. Выключается настройкой
+    RESPONSE_COMPRESSION, если ответы сжимает прокси.
+
+    Работает и в синхронной, и в асинхронной цепочке: под ASGI
+    синхронный middleware выполнялся бы в общем потоке и выстраивал
+    запросы воркера в очередь.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.RESPONSE_COMPRESSION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    @staticmethod
+    def compress(request, response):
+        if (
+            not response.streaming
+            and len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ) or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encodings = _accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+
+        if brotli is not None and 'br' in encodings:
+            encoding = 'br'
+        elif 'gzip' in encodings:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            response.streaming_content = (
+                _brotli_sequence(response.streaming_content)
+                if encoding == 'br'
+                else compress_sequence(response.streaming_content)
+            )
+            del response['Content-Length']
+        else:
+            content = (
+                brotli.compress(response.content, quality=BROTLI_QUALITY)
+                if encoding == 'br'
+                else compress_string(response.content)
+            )
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        response['Content-Encoding'] = encoding
+        return response
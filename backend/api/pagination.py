@@ -1,7 +1,150 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from datetime import datetime
+
 from django.conf import settings
-from rest_framework import pagination
+from django.db import connections
+from django.db.models import Q
+from rest_framework import exceptions, pagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from recipes.feed import timeline
 
 
 class CustomPagination(pagination.PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = settings.PAGE_SIZE
+
+
+class RecipeCursorPagination(pagination.BasePagination):
+    """
+    Курсорная (keyset) пагинация ленты рецептов по (pub_date, id)
+    без COUNT(*) и OFFSET. Страница состоит из строк values().
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = settings.PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get('ordering'):
+            raise exceptions.ValidationError(
+                {'ordering': 'Курсорная пагинация не поддерживает сортировку'}
+            )
+        if request.query_params.get('search'):
+            raise exceptions.ValidationError(
+                {'search': 'Курсорная пагинация не поддерживает поиск'}
+            )
+
+        self.request = request
+        self.page_size = CustomPagination().get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+
+        if position is not None:
+            queryset = self.seek(queryset, *position)
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    @staticmethod
+    def seek(queryset, pub_date, pk):
+        """
+        Рецепты после позиции (pub_date, pk). PostgreSQL и SQLite получают
+        сравнение кортежей (pub_date, id) < (%s, %s): оно сводится
+        к одному диапазону индекса recipe_pub_date_id_idx, тогда как
+        эквивалентное условие с OR планировщик так использовать не может.
+        """
+        connection = connections[queryset.db]
+
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            return queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+            )
+
+        table = connection.ops.quote_name(queryset.model._meta.db_table)
+        return queryset.extra(
+            where=[f'({table}."pub_date", {table}."id") < (%s, %s)'],
+            params=[connection.ops.adapt_datetimefield_value(pub_date), pk]
+        )
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None
+
+        try:
+            pub_date, pk = urlsafe_b64decode(
+                encoded.encode('ascii')
+            ).decode('ascii').split('|')
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (BinasciiError, UnicodeError, ValueError):
+            raise exceptions.NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def encode_cursor(recipe):
+        position = f'{recipe["pub_date"].isoformat()}|{recipe["id"]}'
+        return urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+
+class RecipePagination(pagination.BasePagination):
+    """
+    Постраничная пагинация (?page=&limit=) по умолчанию;
+    курсорная, если в запросе передан параметр cursor (пустой для начала).
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if RecipeCursorPagination.cursor_query_param in request.query_params:
+            self.paginator = RecipeCursorPagination()
+        else:
+            self.paginator = CustomPagination()
+
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+
+class FeedPagination(RecipeCursorPagination):
+    """
+    Курсорная пагинация ленты подписок: id страницы берутся из ленты
+    пользователя, рецепты загружаются из переданного queryset.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = CustomPagination().get_page_size(request)
+        ids = timeline(
+            request.user, self.decode_cursor(request), self.page_size + 1
+        )
+        recipes = {recipe['id']: recipe for recipe in queryset.filter(
+            id__in=ids
+        )}
+
+        self.has_next = len(ids) > self.page_size
+        self.page = [
+            recipes[pk] for pk in ids[:self.page_size] if pk in recipes
+        ]
+        return self.page
@@ -0,0 +1,91 @@
+import csv
+import json
+
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+SHOPPING_CART_HEADER = ['Ингредиент', 'Единица измерения', 'Количество']
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSON через orjson. Без orjson, а также при запросе отступов
+    (браузерный API, indent в Accept) работает стандартный JSONRenderer.
+    Даты и прочие нестандартные типы кодируются как в DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+
+
+class _Echo:
+    """
+    Буфер для csv.writer, возвращающий записанную строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+class PlainTextShoppingCartRenderer(renderers.BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+    @staticmethod
+    def stream(ingredients):
+        for item in ingredients:
+            yield (
+                f'{item["name"]} {item["measurement_unit"]} - '
+                f'{item["total_amount"]}\n'
+            )
+
+
+class CSVShoppingCartRenderer(PlainTextShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    @staticmethod
+    def stream(ingredients):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(SHOPPING_CART_HEADER)
+
+        for item in ingredients:
+            yield writer.writerow([
+                item['name'], item['measurement_unit'], item['total_amount']
+            ])
+
+
+class JSONShoppingCartRenderer(renderers.JSONRenderer):
+    charset = 'utf-8'
+
+    @staticmethod
+    def stream(ingredients):
+        separator = ''
+        yield '['
+
+        for item in ingredients:
+            yield separator + json.dumps(item, ensure_ascii=False)
+            separator = ', '
+
+        yield ']'
@@ -0,0 +1,140 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+from recipes.versions import get_versions
+
+
+class VersionedResponseCache:
+    """
+    Кеш данных ответа, ключ которого включает метки версий коллекций
+    и нормализованные параметры запроса. Запись в коллекции меняет метку,
+    поэтому старые поколения просто перестают читаться и истекают по timeout.
+
+    Счетчики попаданий и промахов ведутся только при включенной настройке
+    RESPONSE_CACHE_STATS: каждый подсчет — запись в кеш, а в файловом
+    кеше это запись файла на каждое попадание.
+    """
+
+    def __init__(self, prefix, params, timeout=None):
+        self.prefix = prefix
+        self.params = params
+        self.timeout = timeout
+
+    def get_timeout(self):
+        if self.timeout is None:
+            return settings.RESPONSE_CACHE_TIMEOUT
+        return self.timeout
+
+    def make_key(self, request, names):
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+            if name in self.params
+        )
+        stamp = repr([
+            request.build_absolute_uri('/'), get_versions(*names), params
+        ])
+        return f'{self.prefix}:{hashlib.md5(stamp.encode()).hexdigest()}'
+
+    def get(self, key):
+        data = cache.get(key)
+        if settings.RESPONSE_CACHE_STATS:
+            self._incr('hits' if data is not None else 'misses')
+        return data
+
+    def set(self, key, data):
+        cache.set(key, data, self.get_timeout())
+
+    def _incr(self, counter):
+        key = f'{self.prefix}:stats:{counter}'
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+    def get_stats(self):
+        keys = [f'{self.prefix}:stats:{name}' for name in ('hits', 'misses')]
+        stats = cache.get_many(keys)
+        return {
+            name: stats.get(key, 0)
+            for name, key in zip(('hits', 'misses'), keys)
+        }
+
+    def reset_stats(self):
+        cache.delete_many(
+            [f'{self.prefix}:stats:{name}' for name in ('hits', 'misses')]
+        )
+
+
+recipe_list_cache = VersionedResponseCache(
+    'recipe_list',
+    params=(
+        'tags', 'author', 'page', 'limit', 'cursor', 'ordering',
+        'is_favorited', 'is_in_shopping_cart', 'search'
+    )
+)
+
+
+class RecipeFragmentCache:
+    """
+    Кеш независимой от пользователя части представления рецепта.
+    Ключ включает id рецепта и метки версий рецепта, его автора, тегов
+    и ингредиентов; метки и фрагменты читаются двумя get_many на страницу.
+    Фрагменты лежат в отдельном кеше CACHES['fragments'] со своим размером,
+    чтобы не вытеснять ответы и метки версий из общего кеша.
+    """
+
+    def __init__(self, prefix, timeout=None, alias='fragments'):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.alias = alias
+
+    def get_timeout(self):
+        if self.timeout is None:
+            return settings.RESPONSE_CACHE_TIMEOUT
+        return self.timeout
+
+    def make_keys(self, rows):
+        names = {'tags', 'ingredients'}
+        for row in rows:
+            names.update((f'recipe:{row["id"]}', f'author:{row["author_id"]}'))
+
+        names = list(names)
+        versions = dict(zip(names, get_versions(*names)))
+        keys = {}
+
+        for row in rows:
+            stamp = repr([
+                versions[f'recipe:{row["id"]}'],
+                versions[f'author:{row["author_id"]}'],
+                versions['tags'],
+                versions['ingredients'],
+            ])
+            keys[row['id']] = (
+                f'{self.prefix}:{row["id"]}:'
+                f'{hashlib.md5(stamp.encode()).hexdigest()}'
+            )
+
+        return keys
+
+    def get_many(self, keys):
+        """
+        Возвращает найденные фрагменты {id рецепта: фрагмент}.
+        """
+        cached = caches[self.alias].get_many(keys.values())
+        return {
+            recipe_id: cached[key]
+            for recipe_id, key in keys.items() if key in cached
+        }
+
+    def set_many(self, keys, fragments):
+        caches[self.alias].set_many(
+            {keys[recipe_id]: data for recipe_id, data in fragments.items()},
+            self.get_timeout()
+        )
+
+
+recipe_fragment_cache = RecipeFragmentCache('recipe_fragment')
@@ -2,11 +2,17 @@ from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status, validators
 
-from recipes.constants import MIN_AMOUNT, MIN_COOKING_TIME, MAX_COOKING_TIME
+from api.fields import RecipeImageField
+from api.response_cache import recipe_fragment_cache
+from recipes.constants import (
+    BULK_RECIPES_LIMIT, MIN_AMOUNT, MIN_COOKING_TIME, MAX_COOKING_TIME
+)
+from recipes.images import variant_name
 from recipes.models import (
     Favorite, Ingredient, IngredientInRecipe,
     Recipe, ShoppingCart, Tag
 )
+from recipes.shopping_list import change_recipe
 from users.models import Subscription, CustomUser
 
 
@@ -23,6 +29,9 @@ class CustomUserSerializer(serializers.ModelSerializer):
         }
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -71,7 +80,7 @@ class CreateIngredientSerializer(serializers.ModelSerializer):
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = RecipeImageField(variant='thumbnail')
 
     class Meta:
         model = Recipe
@@ -80,9 +89,7 @@ class RecipeMinifiedSerializer(serializers.ModelSerializer):
 
 class SubscriptionSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField(
-        method_name='get_count_recipes'
-    )
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta(CustomUserSerializer.Meta):
         model = CustomUser
@@ -92,21 +99,35 @@ class SubscriptionSerializer(CustomUserSerializer):
         ]
         read_only_fields = ['email', 'username', 'first_name', 'last_name']
 
-    def get_recipes(self, obj):
-        request = self.context.get('request')
+    @staticmethod
+    def get_recipes_limit(request):
         recipes_limit = request.query_params.get('recipes_limit')
-        queryset = obj.recipes.all()
 
-        if recipes_limit:
-            try:
-                queryset = queryset[:int(recipes_limit)]
-            except ValueError:
-                pass
+        if recipes_limit is None:
+            return None
 
-        return RecipeMinifiedSerializer(queryset, many=True).data
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            recipes_limit = -1
+
+        if recipes_limit < 0:
+            raise serializers.ValidationError(
+                {'recipes_limit': 'Укажите неотрицательное целое число'}
+            )
+
+        return recipes_limit
+
+    def get_recipes(self, obj):
+        if hasattr(obj, 'limited_recipes'):
+            queryset = obj.limited_recipes
+        else:
+            recipes_limit = self.get_recipes_limit(
+                self.context.get('request')
+            )
+            queryset = obj.recipes.all()[:recipes_limit]
 
-    def get_count_recipes(self, obj):
-        return obj.recipes.count()
+        return RecipeMinifiedSerializer(queryset, many=True).data
 
 
 class SubscriptionCreateSerializer(serializers.ModelSerializer):
@@ -133,6 +154,7 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
         return attrs
 
     def to_representation(self, instance):
+        instance.author.is_subscribed = True
         return SubscriptionSerializer(
             instance.author,
             context={'request': self.context.get('request')}
@@ -142,7 +164,7 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
 class RecipeListSerializer(serializers.ModelSerializer):
     tags = TagSerializer(read_only=True, many=True)
     author = CustomUserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = RecipeImageField(variant='card', list_only=True)
     is_favorited = serializers.SerializerMethodField(
         method_name='check_is_favorite'
     )
@@ -161,6 +183,9 @@ class RecipeListSerializer(serializers.ModelSerializer):
                   'is_favorited', 'is_in_shopping_cart']
 
     def check_is_favorite(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -168,6 +193,9 @@ class RecipeListSerializer(serializers.ModelSerializer):
         )
 
     def check_is_in_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -175,6 +203,156 @@ class RecipeListSerializer(serializers.ModelSerializer):
         )
 
 
+RECIPE_ROW_FIELDS = (
+    'id', 'image', 'variants_source', 'author_id', 'pub_date'
+)
+
+
+class RecipeRowListSerializer(serializers.ListSerializer):
+    """
+    Загружает связанные данные всей страницы сразу, а не для каждой
+    строки отдельно.
+    """
+
+    def to_representation(self, data):
+        rows = list(data)
+        self.child.load_relations(rows)
+        return [self.child.to_representation(row) for row in rows]
+
+
+class RecipeRowSerializer(serializers.BaseSerializer):
+    """
+    Быстрый путь чтения: собирает ответ той же формы, что
+    RecipeListSerializer, из строк values() (RECIPE_ROW_FIELDS и аннотации
+    is_favorited/is_in_shopping_cart), минуя поля DRF и модели.
+    Общая для всех пользователей часть берется из recipe_fragment_cache,
+    промахи собираются запросами values(); подписка на авторов страницы
+    проверяется одним запросом.
+    """
+
+    class Meta:
+        list_serializer_class = RecipeRowListSerializer
+
+    relations = None
+
+    @staticmethod
+    def build_fragments(recipe_ids):
+        fragments = {
+            recipe['id']: {
+                'name': recipe['name'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+                'author': {
+                    'id': recipe['author_id'],
+                    'email': recipe['author__email'],
+                    'username': recipe['author__username'],
+                    'first_name': recipe['author__first_name'],
+                    'last_name': recipe['author__last_name'],
+                },
+                'tags': [],
+                'ingredients': [],
+            }
+            for recipe in Recipe.objects.filter(id__in=recipe_ids).values(
+                'id', 'name', 'text', 'cooking_time', 'author_id',
+                'author__email', 'author__username', 'author__first_name',
+                'author__last_name'
+            )
+        }
+
+        for row in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag_id').values(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+        ):
+            fragments[row['recipe_id']]['tags'].append({
+                'id': row['tag_id'],
+                'name': row['tag__name'],
+                'color': row['tag__color'],
+                'slug': row['tag__slug'],
+            })
+
+        for row in IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            fragments[row['recipe_id']]['ingredients'].append({
+                'id': row['ingredient_id'],
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['amount'],
+            })
+
+        return fragments
+
+    def load_relations(self, rows):
+        keys = recipe_fragment_cache.make_keys(rows)
+        fragments = recipe_fragment_cache.get_many(keys)
+        missing = [
+            row['id'] for row in rows if row['id'] not in fragments
+        ]
+
+        if missing:
+            built = self.build_fragments(missing)
+            recipe_fragment_cache.set_many(keys, built)
+            fragments.update(built)
+
+        request = self.context.get('request')
+        subscribed = set()
+
+        if rows and request is not None and request.user.is_authenticated:
+            subscribed = set(Subscription.objects.filter(
+                user=request.user,
+                author_id__in={row['author_id'] for row in rows}
+            ).values_list('author_id', flat=True))
+
+        self.relations = {'fragments': fragments, 'subscribed': subscribed}
+
+    def get_image(self, row):
+        name = row['image']
+
+        if not name:
+            return None
+
+        if (
+            isinstance(self.parent, serializers.ListSerializer)
+            and row['variants_source'] == name
+        ):
+            name = variant_name(name, 'card')
+
+        url = Recipe._meta.get_field('image').storage.url(name)
+        request = self.context.get('request')
+
+        if request is not None:
+            return request.build_absolute_uri(url)
+
+        return url
+
+    def to_representation(self, row):
+        if self.relations is None:
+            self.load_relations([row])
+
+        fragment = self.relations['fragments'][row['id']]
+        return {
+            'id': row['id'],
+            'author': {
+                **fragment['author'],
+                'is_subscribed': (
+                    row['author_id'] in self.relations['subscribed']
+                ),
+            },
+            'tags': fragment['tags'],
+            'ingredients': fragment['ingredients'],
+            'name': fragment['name'],
+            'image': self.get_image(row),
+            'text': fragment['text'],
+            'cooking_time': fragment['cooking_time'],
+            'is_favorited': row.get('is_favorited', False),
+            'is_in_shopping_cart': row.get('is_in_shopping_cart', False),
+        }
+
+
 class CreateRecipeSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -262,20 +440,57 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe.tags.add(*tags)
         return recipe
 
+    @staticmethod
+    def update_ingredients(ingredients, recipe):
+        current = {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredient.all()
+        }
+        submitted = {item['id'].id: item['amount'] for item in ingredients}
+
+        removed = current.keys() - submitted.keys()
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+
+        changed = []
+        deltas = {}
+        for ingredient_id, amount in submitted.items():
+            item = current.get(ingredient_id)
+            if item is None:
+                deltas[ingredient_id] = amount
+            elif item.amount != amount:
+                deltas[ingredient_id] = amount - item.amount
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+
+        added = [
+            item for item in ingredients if item['id'].id not in current
+        ]
+        if added:
+            CreateRecipeSerializer.create_ingredients(added, recipe)
+
+        # Удаленные строки обрабатываются сигналом post_delete.
+        if deltas:
+            change_recipe(recipe.id, deltas)
+
     @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        instance.ingredients.clear()
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
         validated_data['author'] = self.context.get('request').user
 
-        instance.tags.set(tags)
-        self.create_ingredients(ingredients, instance)
-        instance.tags.add(*tags)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.update_ingredients(ingredients, instance)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        instance.author.is_subscribed = False
         return RecipeListSerializer(
             instance,
             context={'request': self.context.get('request')}
@@ -318,3 +533,14 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             instance.recipe,
             context={'request': self.context.get('request')}
         ).data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_LIMIT
+    )
+
+    def validate_ids(self, value):
+        return list(dict.fromkeys(value))
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_user
+from users.models import CustomUser
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_user_tokens(instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+
+    invalidate_user(instance.pk)
@@ -0,0 +1,758 @@
+import asyncio
+import gzip
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.test import (
+    AsyncClient, RequestFactory, SimpleTestCase, TestCase
+)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.authentication import CachedTokenAuthentication, token_cache
+from api.middleware import CompressionMiddleware
+from api.renderers import FastJSONRenderer
+from api.response_cache import recipe_list_cache
+from api.serializers import RecipeListSerializer, RecipeRowSerializer
+from api.views import RecipeViewSet
+from recipes.constants import SIMILAR_RECIPES_COUNT
+from recipes.feed import rebuild as rebuild_feeds
+from recipes.images import schedule_variants
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart,
+    ShoppingListIngredient, Tag
+)
+from recipes.similarity import build as build_similar
+from recipes.versions import VERSION_CACHE, VERSION_KEY, bump_versions
+from users.models import CustomUser, Subscription
+
+IMAGE = 'recipes/images/test.jpg'
+IMAGE_BASE64 = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+    'AAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+
+class FoodgramTestCase(TestCase):
+    """
+    Общие данные: автор с рецептами, у каждого рецепта два тега
+    и три ингредиента, и читатель, от имени которого идут запросы.
+    """
+    recipes_count = 10
+
+    @classmethod
+    def create_user(cls, username):
+        return CustomUser.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            first_name=username,
+            last_name=username,
+            password='password-1234'
+        )
+
+    @classmethod
+    def create_recipe(cls, author, name, ingredients=None, tags=None):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=name,
+            text=f'Описание {name}',
+            image=IMAGE,
+            variants_source=IMAGE,
+            cooking_time=10
+        )
+        recipe.tags.set(tags if tags is not None else cls.tags)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=5)
+            for ingredient in (
+                ingredients if ingredients is not None else cls.ingredients
+            )
+        )
+        return recipe
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = cls.create_user('author')
+        cls.reader = cls.create_user('reader')
+        cls.tags = [
+            Tag.objects.create(name=slug, color=color, slug=slug)
+            for slug, color in (('breakfast', '#E26C2D'), ('lunch', '#49B64E'))
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('мука', 'сахар', 'соль')
+        ]
+        cls.recipes = [
+            cls.create_recipe(cls.author, f'Рецепт {number}')
+            for number in range(cls.recipes_count)
+        ]
+
+    @staticmethod
+    def clear_caches():
+        for cache in caches.all():
+            cache.clear()
+
+    def setUp(self):
+        self.clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+
+class RecipeQueriesTest(FoodgramTestCase):
+    """
+    Список и карточка рецепта выполняют постоянное число запросов,
+    сколько бы рецептов ни было на странице.
+    """
+
+    def test_list_queries(self):
+        for limit in (1, self.recipes_count):
+            self.clear_caches()
+            with self.assertNumQueries(6):
+                response = self.client.get(
+                    '/api/recipes/', {'limit': limit}
+                )
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_detail_queries(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(f'/api/recipes/{self.recipes[0].pk}/')
+        self.assertEqual(len(response.data['ingredients']), 3)
+
+
+class RecipePreconditionTest(FoodgramTestCase):
+    """
+    If-Match на PATCH зависит только от версии самого рецепта.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.recipes[0]
+        self.url = f'/api/recipes/{self.recipe.pk}/'
+        self.client.force_authenticate(self.author)
+
+    def patch(self, etag, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.patch(
+                self.url, {'name': name}, format='json', HTTP_IF_MATCH=etag
+            )
+
+    def test_unrelated_changes_keep_etag_valid(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='dinner', color='#8775D2', slug='dinner')
+            self.create_user('newcomer')
+            self.client.post(f'/api/recipes/{self.recipes[1].pk}/favorite/')
+
+        self.assertEqual(self.patch(etag, 'Новое название').status_code, 200)
+
+    def test_etag_of_compressed_response(self):
+        with self.settings(COMPRESSION_MIN_SIZE=0):
+            etag = self.client.get(
+                self.url, HTTP_ACCEPT_ENCODING='gzip'
+            )['ETag']
+
+        self.assertTrue(etag.startswith('W/'))
+        self.assertEqual(self.patch(etag, 'Новое название').status_code, 200)
+        self.assertEqual(self.patch(etag, 'Вторая правка').status_code, 412)
+
+    def test_concurrent_edit_is_rejected(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.assertEqual(self.patch(etag, 'Первая правка').status_code, 200)
+        self.assertEqual(self.patch(etag, 'Вторая правка').status_code, 412)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Первая правка')
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    """
+    В асинхронной цепочке middleware остается асинхронным
+    и не переводит запросы воркера в общий поток.
+    """
+    content = b'{"results": []}' * 100
+
+    def request(self):
+        return RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+
+    def assertCompressed(self, response):
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.content)
+
+    def test_sync(self):
+        middleware = CompressionMiddleware(
+            lambda request: HttpResponse(self.content)
+        )
+        self.assertFalse(asyncio.iscoroutinefunction(middleware))
+        self.assertCompressed(middleware(self.request()))
+
+    def test_async(self):
+        async def get_response(request):
+            return HttpResponse(self.content)
+
+        middleware = CompressionMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertCompressed(async_to_sync(middleware)(self.request()))
+
+
+class QueryInstrumentationTest(FoodgramTestCase):
+    """
+    Server-Timing учитывает запросы и в синхронной, и в асинхронной
+    цепочке middleware.
+    """
+
+    def instrumented(self):
+        return self.settings(
+            SQL_INSTRUMENTATION=True,
+            MIDDLEWARE=[
+                'api.middleware.QueryInstrumentationMiddleware',
+                *settings.MIDDLEWARE
+            ]
+        )
+
+    def test_sync(self):
+        with self.instrumented():
+            response = self.client.get('/api/tags/')
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    async def test_async(self):
+        with self.instrumented():
+            response = await AsyncClient().get('/api/tags/')
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+
+class VersionStampsTest(FoodgramTestCase):
+    """
+    Чтение не создает метки версий: их пишет только bump_versions.
+    """
+
+    def test_missing_recipe_does_not_create_stamp(self):
+        self.client.force_authenticate(None)
+        for pk in ('999999', 'abc'):
+            with self.subTest(pk=pk):
+                response = self.client.get(f'/api/recipes/{pk}/')
+                self.assertEqual(response.status_code, 404)
+                self.assertIsNone(
+                    caches[VERSION_CACHE].get(VERSION_KEY.format(
+                        f'recipe:{pk}'
+                    ))
+                )
+
+    def test_lost_stamps_change_etag(self):
+        url = f'/api/recipes/{self.recipes[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url)['ETag'], etag)
+
+        caches[VERSION_CACHE].clear()
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+
+class IngredientIndexTest(FoodgramTestCase):
+    """
+    Снимок индекса ингредиентов меняется вместе с ETag списка,
+    в том числе после изменений из другого процесса.
+    """
+
+    def search(self):
+        response = self.client.get('/api/ingredients/', {'name': 'мук'})
+        return response['ETag'], [item['name'] for item in response.data]
+
+    def test_change_in_other_process(self):
+        etag, names = self.search()
+        self.assertEqual(names, ['мука'])
+
+        # Сигналы другого процесса сюда не доходят: видна только метка.
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='мука ржаная', measurement_unit='г')]
+        )
+        self.assertEqual(self.search(), (etag, names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_versions('ingredients')
+        new_etag, names = self.search()
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(names, ['мука', 'мука ржаная'])
+
+
+class ResponseCacheStatsTest(FoodgramTestCase):
+    """
+    Счетчики попаданий кеша списка пишутся только по настройке.
+    """
+
+    def get_stats(self, enabled):
+        recipe_list_cache.reset_stats()
+        self.client.force_authenticate(None)
+        with self.settings(RESPONSE_CACHE_STATS=enabled):
+            for _ in range(2):
+                self.client.get('/api/recipes/')
+        return recipe_list_cache.get_stats()
+
+    def test_disabled(self):
+        self.assertEqual(self.get_stats(False), {'hits': 0, 'misses': 0})
+
+    def test_enabled(self):
+        self.assertEqual(self.get_stats(True), {'hits': 1, 'misses': 1})
+
+
+class ImageVariantsTest(FoodgramTestCase):
+    """
+    Битая картинка при обработке без пула потоков не ломает запрос,
+    а пишется в лог, как и в пуле.
+    """
+
+    def test_broken_image_inline(self):
+        recipe = self.recipes[0]
+        with tempfile.TemporaryDirectory() as media:
+            with self.settings(MEDIA_ROOT=media, IMAGE_VARIANT_WORKERS=0):
+                recipe.image.storage.save(IMAGE, ContentFile(b'not an image'))
+                with self.assertLogs('recipes.images', 'ERROR'):
+                    schedule_variants(recipe.pk)
+
+
+class RecipeListETagTest(FoodgramTestCase):
+    """
+    Чужое избранное меняет ETag списка только при сортировке.
+    """
+
+    def get_etag(self, **params):
+        self.client.force_authenticate(self.reader)
+        return self.client.get('/api/recipes/', params)['ETag']
+
+    def test_popularity_affects_only_ordered_list(self):
+        plain = self.get_etag()
+        ordered = self.get_etag(ordering='-favorites_count')
+
+        self.client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/recipes/{self.recipes[0].pk}/favorite/')
+
+        self.assertEqual(self.get_etag(), plain)
+        self.assertNotEqual(
+            self.get_etag(ordering='-favorites_count'), ordered
+        )
+
+
+class RecipeCursorPaginationTest(FoodgramTestCase):
+    """
+    Обход ленты курсором возвращает все рецепты по одному разу
+    в порядке (-pub_date, -id), в том числе при равных датах.
+    """
+
+    def test_walk(self):
+        Recipe.objects.filter(id__in=[
+            recipe.pk for recipe in self.recipes[:5]
+        ]).update(pub_date=self.recipes[0].pub_date)
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+
+        seen = []
+        url = '/api/recipes/?cursor=&limit=3'
+        while url:
+            response = self.client.get(url).data
+            seen.extend(recipe['id'] for recipe in response['results'])
+            url = response['next']
+
+        self.assertEqual(seen, expected)
+
+
+class RecipeUpdateWritesTest(FoodgramTestCase):
+    """
+    Изменение одного количества в рецепте стоит постоянного числа
+    записей, сколько бы ингредиентов в нем ни было.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.large = cls.create_recipe(cls.author, 'Большой', [
+            Ingredient.objects.create(
+                name=f'специя {number}', measurement_unit='г'
+            )
+            for number in range(20)
+        ])
+
+    def count_writes(self, recipe):
+        items = [
+            {'id': item.ingredient_id, 'amount': item.amount}
+            for item in recipe.recipe_ingredient.order_by('id')
+        ]
+        items[0]['amount'] += 1
+        self.client.force_authenticate(self.author)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/recipes/{recipe.pk}/',
+                {
+                    'ingredients': items,
+                    'tags': [tag.pk for tag in self.tags]
+                },
+                format='json'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+        ]
+
+    def test_one_amount_change(self):
+        small = self.count_writes(self.recipes[0])
+        large = self.count_writes(self.large)
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(len(small), 2, small)
+
+
+class BulkCountersTest(FoodgramTestCase):
+    """
+    Повторные пакетные запросы не меняют счетчики второй раз.
+    """
+
+    def test_repeated_bulk_requests(self):
+        ids = [recipe.pk for recipe in self.recipes[:3]]
+
+        for method, expected in (('post', 1), ('delete', 0)):
+            for _ in range(2):
+                response = getattr(self.client, method)(
+                    '/api/recipes/favorite/bulk/', {'ids': ids},
+                    format='json'
+                )
+                self.assertEqual(response.status_code, 200)
+
+            self.assertEqual(
+                set(Recipe.objects.filter(id__in=ids).values_list(
+                    'favorites_count', flat=True
+                )),
+                {expected}
+            )
+
+
+class ShoppingListConsistencyTest(FoodgramTestCase):
+    """
+    Материализованный список покупок совпадает с SUM по корзине
+    после каждой операции с корзиной и рецептами в ней.
+    """
+
+    def assertConsistent(self):
+        live = dict(IngredientInRecipe.objects.filter(
+            recipe__shopping_carts__user=self.reader
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total'))
+        stored = dict(ShoppingListIngredient.objects.filter(
+            user=self.reader
+        ).values_list('ingredient_id', 'total_amount'))
+        self.assertEqual(stored, live)
+
+    def request(self, user, method, url, data=None):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 300, response.data)
+        self.assertConsistent()
+
+    def test_operations(self):
+        first, second, third, fourth = (
+            recipe.pk for recipe in self.recipes[:4]
+        )
+        salt = self.ingredients[2]
+        pepper = Ingredient.objects.create(name='перец', measurement_unit='г')
+
+        self.request(
+            self.reader, 'post', f'/api/recipes/{first}/shopping_cart/'
+        )
+        self.request(
+            self.reader, 'post', '/api/recipes/shopping_cart/bulk/',
+            {'ids': [first, second, third, fourth]}
+        )
+        self.request(self.author, 'patch', f'/api/recipes/{second}/', {
+            'ingredients': [
+                {'id': salt.pk, 'amount': 7},
+                {'id': pepper.pk, 'amount': 2},
+            ],
+            'tags': [tag.pk for tag in self.tags],
+        })
+        self.request(
+            self.reader, 'delete', f'/api/recipes/{first}/shopping_cart/'
+        )
+        self.request(self.author, 'delete', f'/api/recipes/{third}/')
+        self.request(
+            self.reader, 'delete', '/api/recipes/shopping_cart/bulk/',
+            {'ids': [second, fourth]}
+        )
+        self.assertFalse(
+            ShoppingListIngredient.objects.filter(user=self.reader).exists()
+        )
+
+
+class RecipeSearchTest(FoodgramTestCase):
+    """
+    Поиск ранжирует результаты и не совмещается с курсором,
+    который сбросил бы ранжирование.
+    """
+
+    def test_search(self):
+        response = self.client.get('/api/recipes/', {'search': 'Рецепт 3'})
+        self.assertEqual(response.data['results'][0]['name'], 'Рецепт 3')
+
+    def test_search_with_cursor(self):
+        response = self.client.get(
+            '/api/recipes/', {'search': 'Рецепт', 'cursor': ''}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('search', response.data)
+
+
+class SimilarRecipesTest(FoodgramTestCase):
+    """
+    Похожие рецепты отдаются по убыванию сходства, а неизвестный
+    или нечисловой id дает 404, как и у карточки рецепта.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = cls.create_recipe(
+            cls.author, 'Другой рецепт', ingredients=cls.ingredients[:1]
+        )
+        build_similar()
+
+    def test_similar(self):
+        response = self.client.get(f'/api/recipes/{self.other.id}/similar/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), SIMILAR_RECIPES_COUNT)
+        self.assertNotIn(
+            self.other.id, [recipe['id'] for recipe in response.data]
+        )
+
+    def test_unknown_recipe(self):
+        for pk in (self.other.id + 1, 'abc'):
+            with self.subTest(pk=pk):
+                response = self.client.get(f'/api/recipes/{pk}/similar/')
+                self.assertEqual(response.status_code, 404)
+
+
+class TokenAuthenticationTest(FoodgramTestCase):
+    """
+    Кешированная аутентификация по токену.
+    """
+
+    def setUp(self):
+        super().setUp()
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.reader)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_request_changes_do_not_leak_into_cache(self):
+        authentication = CachedTokenAuthentication()
+
+        for _ in range(2):
+            user, token = authentication.authenticate_credentials(
+                self.token.key
+            )
+            self.assertEqual(user.email, self.reader.email)
+            self.assertIs(token.user, user)
+            user.email = 'unsaved@example.com'
+
+    def assertRevoked(self, revoke):
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            revoke()
+
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+    def test_logout_revokes_token(self):
+        self.assertRevoked(
+            lambda: self.client.post('/api/auth/token/logout/')
+        )
+
+    def test_deactivation_revokes_token(self):
+        def deactivate():
+            self.reader.is_active = False
+            self.reader.save()
+
+        self.assertRevoked(deactivate)
+
+    def test_revocation_in_other_process(self):
+        """
+        Другой процесс не очищает локальный кеш, а меняет метку версии.
+        """
+        def revoke_elsewhere():
+            Token.objects.filter(pk=self.token.pk).update(key='revoked')
+            bump_versions(f'auth:{self.reader.pk}')
+
+        self.assertRevoked(revoke_elsewhere)
+
+
+class NestedUserQueriesTest(FoodgramTestCase):
+    """
+    Эндпоинты, вкладывающие CustomUserSerializer, выполняют постоянное
+    число запросов: is_subscribed не запрашивается для каждого автора.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.authors = [cls.author] + [
+            cls.create_user(f'author{number}') for number in range(4)
+        ]
+        for author in cls.authors:
+            cls.create_recipe(author, f'Рецепт {author.username}')
+            Subscription.objects.create(user=cls.reader, author=author)
+        cls.stranger = cls.create_user('stranger')
+        rebuild_feeds()
+
+    def assertQueries(self, count, method, url, data=None, status=200):
+        self.clear_caches()
+        with self.assertNumQueries(count):
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, status, response.data)
+        return response
+
+    def test_users(self):
+        for limit in (1, 6):
+            response = self.assertQueries(
+                2, 'get', f'/api/users/?limit={limit}'
+            )
+            self.assertEqual(len(response.data['results']), limit)
+
+        self.assertQueries(1, 'get', f'/api/users/{self.author.pk}/')
+        self.assertQueries(0, 'get', '/api/users/me/')
+
+    def test_subscriptions(self):
+        for limit in (1, 5):
+            response = self.assertQueries(
+                3, 'get', f'/api/users/subscriptions/?limit={limit}'
+            )
+            self.assertTrue(all(
+                author['is_subscribed']
+                for author in response.data['results']
+            ))
+
+        self.assertQueries(
+            6, 'post', f'/api/users/{self.stranger.pk}/subscribe/',
+            status=201
+        )
+
+    def test_recipes(self):
+        for limit in (1, 10):
+            self.assertQueries(6, 'get', f'/api/recipes/?limit={limit}')
+        self.assertQueries(5, 'get', f'/api/recipes/{self.recipes[0].pk}/')
+        for limit in (1, 5):
+            response = self.assertQueries(
+                7, 'get', f'/api/recipes/feed/?limit={limit}'
+            )
+            self.assertEqual(len(response.data['results']), limit)
+
+    def test_create_recipe(self):
+        self.client.force_authenticate(self.author)
+        data = {
+            'name': 'Новый',
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': IMAGE_BASE64,
+            'tags': [tag.pk for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 1}
+                for ingredient in self.ingredients
+            ],
+        }
+
+        with tempfile.TemporaryDirectory() as media:
+            with self.settings(MEDIA_ROOT=media):
+                self.assertQueries(
+                    20, 'post', '/api/recipes/', data, status=201
+                )
+
+
+class SubscriptionRecipesLimitTest(FoodgramTestCase):
+    """
+    recipes_limit ограничивает рецепты каждого автора в подписках,
+    в том числе когда подписок нет.
+    """
+
+    def test_recipes_limit(self):
+        Subscription.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        author = response.data['results'][0]
+        self.assertEqual(
+            [recipe['id'] for recipe in author['recipes']],
+            [recipe.id for recipe in self.recipes[:-3:-1]]
+        )
+        self.assertEqual(author['recipes_count'], self.recipes_count)
+
+    def test_no_subscriptions(self):
+        response = self.client.get(
+            '/api/users/subscriptions/', {'recipes_limit': 3}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+
+class RecipeRowContractTest(FoodgramTestCase):
+    """
+    Быстрый сериализатор строк values() отдает те же байты, что
+    RecipeListSerializer, в списке и в карточке, для анонима и для
+    пользователя с избранным, корзиной и подпиской, с холодным
+    и прогретым кешем фрагментов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Recipe.objects.filter(pk=cls.recipes[1].pk).update(
+            variants_source=''
+        )
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[2])
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+        cls.create_recipe(cls.create_user('other'), 'Чужой', tags=[])
+
+    @staticmethod
+    def make_request(user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        return request
+
+    def render_both(self, user, many):
+        request = self.make_request(user)
+        view = RecipeViewSet(request=request, format_kwarg=None)
+        context = {'request': request}
+        rows = view.get_queryset().order_by('-pub_date', '-id')
+        recipes = Recipe.objects.order_by('-pub_date', '-id')
+
+        if not many:
+            rows, recipes = rows[0], recipes[0]
+
+        return (
+            FastJSONRenderer().render(RecipeListSerializer(
+                recipes, many=many, context=context
+            ).data),
+            FastJSONRenderer().render(RecipeRowSerializer(
+                rows, many=many, context=context
+            ).data)
+        )
+
+    def test_identical_output(self):
+        for user in (AnonymousUser(), self.reader):
+            for many in (True, False):
+                with self.subTest(user=user, many=many):
+                    self.clear_caches()
+                    expected, cold = self.render_both(user, many)
+                    _, warm = self.render_both(user, many)
+                    self.assertEqual(cold, expected)
+                    self.assertEqual(warm, expected)
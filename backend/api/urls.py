@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api.async_views import with_async_reads
 from api.views import (
     CustomUserViewSet, IngredientViewSet, RecipeViewSet, TagViewSet
 )
@@ -14,8 +16,13 @@ router_v1.register('tags', TagViewSet)
 router_v1.register('ingredients', IngredientViewSet)
 router_v1.register('recipes', RecipeViewSet)
 
+router_urls = router_v1.urls
+
+if settings.ASYNC_READ_VIEWS:
+    router_urls = with_async_reads(router_urls)
+
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
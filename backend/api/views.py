@@ -1,36 +1,63 @@
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import (
+    BooleanField, Exists, F, OuterRef, Prefetch, Subquery, Value
+)
+from django.http import Http404, StreamingHttpResponse
+from django.db.models.query import prefetch_related_objects
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import filters, permissions, status, viewsets
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from api.filters import CustomIngredientFilter, CustomRecipeFilter
+from api.conditional import versioned_condition, versioned_precondition
+from api.filters import CustomRecipeFilter, RecipeOrderingFilter
 from api.mixins import ListRetrieveMixin
-from api.pagination import CustomPagination
+from api.pagination import (
+    CustomPagination, FeedPagination, RecipePagination
+)
+from api.renderers import (
+    CSVShoppingCartRenderer, JSONShoppingCartRenderer,
+    PlainTextShoppingCartRenderer
+)
+from api.response_cache import recipe_list_cache
 from api.serializers import (
     CreateRecipeSerializer, CustomUserSerializer,
-    FavoriteSerializer, IngredientSerializer,
+    FavoriteSerializer, IngredientSerializer, RecipeMinifiedSerializer,
     ShoppingCartSerializer, SubscriptionCreateSerializer,
-    SubscriptionSerializer, RecipeListSerializer, TagSerializer
+    SubscriptionSerializer, RECIPE_ROW_FIELDS, RecipeIdsSerializer,
+    RecipeRowSerializer, TagSerializer
 )
+from recipes.bulk import bulk_add, bulk_remove, lock_user
+from recipes.index import ingredient_index
 from recipes.models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+    Favorite, Ingredient, Recipe, ShoppingCart,
+    ShoppingListIngredient, Tag
 )
 from users.models import Subscription, CustomUser
 
 
+@method_decorator(versioned_condition('ingredients'), name='list')
+@method_decorator(versioned_condition('ingredients'), name='retrieve')
 class IngredientViewSet(ListRetrieveMixin):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     pagination_class = None
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
-    filterset_class = CustomIngredientFilter
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+
+        if name:
+            return Response(ingredient_index.search(name))
+
+        return super().list(request, *args, **kwargs)
 
 
+@method_decorator(versioned_condition('tags'), name='list')
+@method_decorator(versioned_condition('tags'), name='retrieve')
 class TagViewSet(ListRetrieveMixin):
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
@@ -45,12 +72,37 @@ class CustomUserViewSet(UserViewSet):
     pagination_class = CustomPagination
     lookup_field = 'id'
 
+    def get_queryset(self):
+        user = self.request.user
+        queryset = super().get_queryset()
+
+        if user.is_authenticated:
+            return queryset.annotate(
+                is_subscribed=Exists(Subscription.objects.filter(
+                    user=user, author=OuterRef('pk')
+                ))
+            )
+
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+
+    def get_instance(self):
+        """
+        /users/me/: подписка на самого себя запрещена ограничением
+        модели, поэтому is_subscribed известен без запроса.
+        """
+        user = self.request.user
+        user.is_subscribed = False
+        return user
+
     @action(detail=True, methods=['POST', 'DELETE'])
     def subscribe(self, request, id=None):
         user = request.user
         author = get_object_or_404(CustomUser, id=id)
 
         if request.method == 'POST':
+            SubscriptionSerializer.get_recipes_limit(request)
             serializer = SubscriptionCreateSerializer(
                 data={'user': user.id, 'author': author.id},
                 context={'request': request}
@@ -70,8 +122,14 @@ class CustomUserViewSet(UserViewSet):
 
     @action(detail=False, methods=['GET'])
     def subscriptions(self, request):
-        queryset = CustomUser.objects.filter(following__user=request.user)
+        recipes_limit = SubscriptionSerializer.get_recipes_limit(request)
+        queryset = CustomUser.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
         page = self.paginate_queryset(queryset)
+        self._prefetch_limited_recipes(page, recipes_limit)
 
         serializer = SubscriptionSerializer(
             page,
@@ -81,24 +139,112 @@ class CustomUserViewSet(UserViewSet):
 
         return self.get_paginated_response(serializer.data)
 
+    @staticmethod
+    def _prefetch_limited_recipes(authors, recipes_limit):
+        """
+        Загружает первые recipes_limit рецептов каждого автора одним
+        запросом: коррелированный подзапрос выбирает последние рецепты
+        автора по индексу recipe_author_pub_date_idx.
+        """
+        if not authors:
+            return
+
+        recipes = Recipe.objects.all()
+
+        if recipes_limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date', '-id').values('id')[:recipes_limit]
+            ))
+
+        prefetch_related_objects(
+            authors,
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
+
+
+RECIPE_VERSIONS = ('recipes', 'tags', 'ingredients', 'users')
+RECIPE_DETAIL_VERSIONS = ('recipe:{pk}', 'tags', 'ingredients', 'users')
+
 
+def ordering_versions(request):
+    """
+    Счетчики избранного и корзин влияют на список только при сортировке.
+    """
+    if request.GET.get('ordering'):
+        return ('popularity',)
+    return ()
+
+
+@method_decorator(
+    versioned_condition(
+        *RECIPE_VERSIONS, per_user=True, extra=ordering_versions
+    ),
+    name='list'
+)
+@method_decorator(
+    versioned_condition(
+        *RECIPE_DETAIL_VERSIONS, per_user=True, key='recipe:{pk}'
+    ),
+    name='retrieve'
+)
+@method_decorator(versioned_precondition('recipe:{pk}'), name='partial_update')
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.select_related(
-        'author'
-    ).prefetch_related('ingredients', 'tags').all()
+    queryset = Recipe.objects.all()
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
-    pagination_class = CustomPagination
-    filter_backends = (DjangoFilterBackend,)
+    pagination_class = RecipePagination
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = CustomRecipeFilter
+    ordering_fields = ('favorites_count', 'in_carts_count', 'pub_date')
     http_method_names = ['get', 'post', 'patch', 'delete']
 
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Recipe.objects.all()
+
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_favorited=Exists(Favorite.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )),
+                is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                ))
+            )
+
+        if self.request.method == 'GET':
+            return queryset.values(
+                *RECIPE_ROW_FIELDS, *queryset.query.annotations
+            )
+
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+
+        names = RECIPE_VERSIONS + ordering_versions(request)
+        key = recipe_list_cache.make_key(request, names)
+        data = recipe_list_cache.get(key)
+
+        if data is not None:
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        response = super().list(request, *args, **kwargs)
+        recipe_list_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
-            return RecipeListSerializer
+            return RecipeRowSerializer
         return CreateRecipeSerializer
 
     @action(detail=True, methods=['POST'])
+    @transaction.atomic
     def shopping_cart(self, request, pk):
+        lock_user(request.user)
         recipe = get_object_or_404(Recipe, id=pk)
         data = {'recipe': recipe.id, 'user': request.user.id}
 
@@ -111,7 +257,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
+    @transaction.atomic
     def destroy_shopping_cart(self, request, pk):
+        lock_user(request.user)
         get_object_or_404(
             ShoppingCart,
             recipe__id=pk,
@@ -120,7 +268,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['POST'])
+    @transaction.atomic
     def favorite(self, request, pk):
+        lock_user(request.user)
         recipe = get_object_or_404(Recipe, id=pk)
         data = {'recipe': recipe.id, 'user': request.user.id}
 
@@ -133,7 +283,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
+    @transaction.atomic
     def destroy_favorite(self, request, pk):
+        lock_user(request.user)
         get_object_or_404(
             Favorite,
             recipe__id=pk,
@@ -141,50 +293,91 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(detail=False, methods=['GET'])
-    def download_shopping_cart(self, request):
-        filename = 'shop_carts.txt'
+    @action(detail=True, methods=['GET'])
+    def similar(self, request, pk):
+        try:
+            recipes = list(Recipe.objects.filter(
+                similar_to__recipe_id=pk
+            ).order_by('-similar_to__score', 'id'))
+        except (TypeError, ValueError):
+            raise Http404
 
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_carts__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(total_amount=Sum('amount')).order_by('ingredient__name')
+        if not recipes and not Recipe.objects.filter(id=pk).exists():
+            raise Http404
 
-        headers = {
-            'Content-Disposition': f'attachment; filename={filename}'
-        }
+        serializer = RecipeMinifiedSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
 
-        with open(filename, mode='w', encoding='UTF-8') as file:
-            file.write(self._make_shopping_cart(ingredients))
+    @staticmethod
+    def _bulk_change(request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = bulk_add if request.method == 'POST' else bulk_remove
+        statuses = change(
+            model, request.user, serializer.validated_data['ids']
+        )
 
-        return FileResponse(open(filename, 'rb'), headers=headers)
+        return Response({'results': [
+            {'id': recipe_id, 'status': result}
+            for recipe_id, result in statuses.items()
+        ]})
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='shopping_cart/bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def bulk_shopping_cart(self, request):
+        return self._bulk_change(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='favorite/bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def bulk_favorite(self, request):
+        return self._bulk_change(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
-    @staticmethod
-    def _make_shopping_cart(ingredients):
-        shop_carts = ''
-        current_ingr = None
-        total_amount = 0
-
-        for ingredient in ingredients:
-            name = ingredient.get('ingredient__name')
-            measurement_unit = ingredient.get('ingredient__measurement_unit')
-            ingredient_amount = ingredient.get('total_amount')
-
-            if current_ingr and current_ingr != name:
-                shop_carts += (
-                    f'{current_ingr} {measurement_unit} - {total_amount}\n'
-                )
-                total_amount = 0
-
-            current_ingr = name
-            total_amount += ingredient_amount
-
-        if current_ingr:
-            shop_carts += (
-                f'{current_ingr} {measurement_unit} - '
-                f'{total_amount}\n'
-            )
+    @action(
+        detail=False,
+        methods=['GET'],
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(
+            PlainTextShoppingCartRenderer,
+            CSVShoppingCartRenderer,
+            JSONShoppingCartRenderer
+        )
+    )
+    def download_shopping_cart(self, request):
+        renderer = request.accepted_renderer
+        filename = f'shop_carts.{renderer.format}'
 
-        return shop_carts
+        ingredients = ShoppingListIngredient.objects.filter(
+            user=request.user
+        ).values(
+            'total_amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit')
+        ).order_by('name', 'measurement_unit')
+
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator()),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = f'attachment; filename={filename}'
+        return response
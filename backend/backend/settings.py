@@ -27,6 +27,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,10 +64,51 @@ DATABASES = {
         'USER': config('POSTGRES_USER', default='postgres', cast=str),
         'PASSWORD': config('POSTGRES_PASSWORD', default='dev_mode_1234', cast=str),
         'HOST': config('DB_HOST', default='db', cast=str),
-        'PORT': config('DB_PORT', default='5432', cast=int)
+        'PORT': config('DB_PORT', default='5432', cast=int),
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=0, cast=int),
     }
 }
 
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache', cast=str)
+CACHE_LOCATION = config('CACHE_LOCATION', default=str(BASE_DIR / 'cache'), cast=str)
+
+# Метки версий лежат в отдельном кеше. Их создает только bump_versions,
+# поэтому записей не больше, чем измененных рецептов и авторов; метка,
+# вытесненная из кеша, вернулась бы к общей эпохе, и старый ETag снова
+# совпал бы. VERSION_CACHE_MAX_ENTRIES должен превышать число рецептов
+# и авторов.
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int),
+            'CULL_FREQUENCY': config('CACHE_CULL_FREQUENCY', default=4, cast=int),
+        },
+    },
+    'versions': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('VERSION_CACHE_LOCATION', default=f'{CACHE_LOCATION}/versions', cast=str),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('VERSION_CACHE_MAX_ENTRIES', default=1000000, cast=int),
+            'CULL_FREQUENCY': config('VERSION_CACHE_CULL_FREQUENCY', default=10, cast=int),
+        },
+    },
+    # Фрагменты рецептов неизменяемы (ключ включает метки версий), поэтому
+    # по умолчанию хранятся в памяти процесса. Фрагмент занимает 1-2 КБ:
+    # 20000 записей — до 40 МБ на процесс; размер стоит выбирать по числу
+    # часто читаемых рецептов.
+    'fragments': {
+        'BACKEND': config('FRAGMENT_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache', cast=str),
+        'LOCATION': config('FRAGMENT_CACHE_LOCATION', default='recipe-fragments', cast=str),
+        'TIMEOUT': config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('FRAGMENT_CACHE_MAX_ENTRIES', default=20000, cast=int),
+            'CULL_FREQUENCY': config('FRAGMENT_CACHE_CULL_FREQUENCY', default=4, cast=int),
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -98,9 +140,42 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 PAGE_SIZE = 6
 
+TOKEN_CACHE_SIZE = config('TOKEN_CACHE_SIZE', default=10000, cast=int)
+TOKEN_CACHE_TTL = config('TOKEN_CACHE_TTL', default=60, cast=int)
+
+RESPONSE_COMPRESSION = config(
+    'RESPONSE_COMPRESSION', default=True, cast=bool
+)
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=512, cast=int)
+
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
+ASYNC_DB_WORKERS = config('ASYNC_DB_WORKERS', default=10, cast=int)
+
+SQL_INSTRUMENTATION = config('SQL_INSTRUMENTATION', default=False, cast=bool)
+SQL_LATENCY_BUDGET_MS = config('SQL_LATENCY_BUDGET_MS', default=500, cast=int)
+SQL_QUERY_BUDGET = config('SQL_QUERY_BUDGET', default=20, cast=int)
+SQL_REPEATED_QUERY_BUDGET = config('SQL_REPEATED_QUERY_BUDGET', default=3, cast=int)
+
+if SQL_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, 'api.middleware.QueryInstrumentationMiddleware')
+
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+RESPONSE_CACHE_STATS = config('RESPONSE_CACHE_STATS', default=False, cast=bool)
+
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', default=2, cast=int)
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
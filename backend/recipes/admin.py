@@ -30,16 +30,11 @@ class IngredientInRecipeAdmin(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'favorites_count')
+    list_display = ('name', 'author', 'favorites_count', 'in_carts_count')
     list_filter = ('name', 'author__username', 'tags__name')
     search_fields = ('name', 'author__username', 'tags__name')
     inlines = (IngredientInRecipeAdmin,)
-    readonly_fields = ('favorites_count',)
-
-    def favorites_count(self, obj):
-        return obj.favorites.count()
-
-    favorites_count.short_description = 'Добавлено в избранное'
+    readonly_fields = ('favorites_count', 'in_carts_count')
 
 
 @admin.register(Favorite)
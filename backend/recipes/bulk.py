@@ -0,0 +1,103 @@
+from django.db import transaction
+
+from recipes.counters import update_counters
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.shopping_list import add_recipes, remove_recipes
+from recipes.versions import bump_versions
+from users.models import CustomUser
+
+COUNTER_FIELDS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+ADDED = 'added'
+REMOVED = 'removed'
+ALREADY_EXISTS = 'already_exists'
+NOT_FOUND = 'not_found'
+
+
+def lock_user(user):
+    """
+    Блокирует строку пользователя до конца транзакции. Операции одного
+    пользователя с избранным и корзиной выполняются по очереди, поэтому
+    дельты счетчиков и списка покупок считаются по зафиксированному
+    состоянию: повторный запрос (двойной клик) увидит уже добавленные
+    или удаленные строки и ничего не применит второй раз.
+    """
+    CustomUser.objects.select_for_update().only('id').get(pk=user.pk)
+
+
+def _delete(model, user, recipe_ids):
+    """
+    Удаляет строки одним DELETE через ORM без загрузки объектов
+    и поштучных сигналов: их работу выполняет _finish.
+    Возвращает число удаленных строк.
+    """
+    if not recipe_ids:
+        return 0
+
+    queryset = model.objects.filter(user=user, recipe_id__in=recipe_ids)
+    return queryset._raw_delete(queryset.db)
+
+
+def _finish(model, user, recipe_ids, delta):
+    if recipe_ids:
+        update_counters(Recipe, recipe_ids, COUNTER_FIELDS[model], delta)
+        bump_versions(f'user:{user.pk}', 'popularity')
+
+
+@transaction.atomic
+def bulk_add(model, user, recipe_ids):
+    """
+    Добавляет рецепты в избранное или корзину одним INSERT.
+    bulk_create не отправляет сигналы, поэтому счетчики и метки версий
+    обновляются здесь же. Возвращает статус для каждого id.
+    """
+    lock_user(user)
+    found = set(
+        Recipe.objects.filter(id__in=recipe_ids).values_list('id', flat=True)
+    )
+    existing = set(model.objects.filter(
+        user=user, recipe_id__in=found
+    ).values_list('recipe_id', flat=True))
+    added = found - existing
+
+    model.objects.bulk_create(
+        [model(user=user, recipe_id=recipe_id) for recipe_id in added],
+        ignore_conflicts=True
+    )
+    _finish(model, user, added, 1)
+    if model is ShoppingCart:
+        add_recipes(user.pk, added)
+
+    return {
+        recipe_id: (
+            ADDED if recipe_id in added
+            else ALREADY_EXISTS if recipe_id in existing
+            else NOT_FOUND
+        )
+        for recipe_id in recipe_ids
+    }
+
+
+@transaction.atomic
+def bulk_remove(model, user, recipe_ids):
+    """
+    Удаляет рецепты из избранного или корзины одним DELETE без загрузки
+    объектов и поштучных сигналов. Возвращает статус для каждого id.
+    """
+    lock_user(user)
+    removed = set(model.objects.filter(
+        user=user, recipe_id__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+
+    if _delete(model, user, removed):
+        _finish(model, user, removed, -1)
+        if model is ShoppingCart:
+            remove_recipes(user.pk, removed)
+
+    return {
+        recipe_id: REMOVED if recipe_id in removed else NOT_FOUND
+        for recipe_id in recipe_ids
+    }
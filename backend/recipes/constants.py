@@ -6,3 +6,16 @@ MAX_COOKING_TIME = 1000
 MIN_AMOUNT = 1
 MAX_AMOUNT = 10000
 HEX_COLOR_REGEX = '^#(?:[A-Fa-f0-9]{3}){1,2}$'
+INGREDIENT_SEARCH_LIMIT = 50
+IMAGE_VARIANTS = {
+    'thumbnail': (240, 240),
+    'card': (720, 480),
+}
+IMAGE_VARIANTS_DIR = 'recipes/variants/'
+IMAGE_JPEG_QUALITY = 85
+IMAGE_WEBP_QUALITY = 80
+BULK_RECIPES_LIMIT = 100
+FEED_RETENTION = 500
+FEED_TRIM_SLACK = 50
+FEED_PULL_RECIPES_COUNT = 200
+SIMILAR_RECIPES_COUNT = 10
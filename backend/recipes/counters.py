@@ -0,0 +1,54 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import CustomUser
+
+
+def update_counters(model, pks, field, delta):
+    """
+    Атомарно изменяет счетчик field объектов model на delta.
+    """
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def update_counter(model, pk, field, delta):
+    update_counters(model, [pk], field, delta)
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def recount_counters():
+    """
+    Пересчитывает денормализованные счетчики по фактическим данным.
+    Возвращает количество исправленных рецептов и пользователей.
+    """
+    favorites_count = _count(Favorite, 'recipe')
+    in_carts_count = _count(ShoppingCart, 'recipe')
+    recipes_count = _count(Recipe, 'author')
+
+    recipes = Recipe.objects.annotate(
+        actual_favorites_count=favorites_count,
+        actual_in_carts_count=in_carts_count
+    ).filter(
+        ~Q(favorites_count=F('actual_favorites_count'))
+        | ~Q(in_carts_count=F('actual_in_carts_count'))
+    ).update(favorites_count=favorites_count, in_carts_count=in_carts_count)
+
+    users = CustomUser.objects.annotate(
+        actual_recipes_count=recipes_count
+    ).exclude(
+        recipes_count=F('actual_recipes_count')
+    ).update(recipes_count=recipes_count)
+
+    return recipes, users
@@ -0,0 +1,184 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from recipes.constants import (
+    FEED_PULL_RECIPES_COUNT, FEED_RETENTION, FEED_TRIM_SLACK
+)
+from recipes.models import FeedEntry, Recipe
+from users.models import CustomUser, Subscription
+
+FEED_BATCH_SIZE = 1000
+
+
+def is_pulled(author_id):
+    """
+    Рецепты плодовитых авторов не раскладываются по лентам подписчиков,
+    а подмешиваются при чтении (fan-out-on-read).
+    """
+    return CustomUser.objects.filter(
+        id=author_id, recipes_count__gt=FEED_PULL_RECIPES_COUNT
+    ).exists()
+
+
+def trim(user_ids):
+    """
+    Оставляет в лентах не более FEED_RETENTION новейших записей.
+    Ленты обрезаются, только когда переполнены на FEED_TRIM_SLACK,
+    чтобы не выполнять DELETE при каждой публикации.
+    """
+    overflowed = list(FeedEntry.objects.filter(
+        user_id__in=user_ids
+    ).values('user_id').annotate(
+        size=Count('id')
+    ).filter(
+        size__gt=FEED_RETENTION + FEED_TRIM_SLACK
+    ).values_list('user_id', flat=True))
+
+    if not overflowed:
+        return
+
+    ranked = FeedEntry.objects.filter(
+        user_id__in=overflowed
+    ).annotate(
+        position=Window(
+            expression=RowNumber(),
+            partition_by=F('user'),
+            order_by=(F('pub_date').desc(), F('recipe_id').desc())
+        )
+    ).order_by().values('id', 'position')
+    sql, params = ranked.query.sql_with_params()
+    FeedEntry.objects.filter(id__in=RawSQL(
+        f'SELECT ranked.id FROM ({sql}) ranked WHERE ranked.position > %s',
+        (*params, FEED_RETENTION)
+    )).delete()
+
+
+def _insert(entries):
+    FeedEntry.objects.bulk_create(
+        entries, batch_size=FEED_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(recipe_id):
+    """
+    Раскладывает новый рецепт по лентам подписчиков автора.
+    """
+    recipe = Recipe.objects.filter(
+        id=recipe_id
+    ).values('author_id', 'pub_date').first()
+
+    if recipe is None or is_pulled(recipe['author_id']):
+        return
+
+    followers = list(Subscription.objects.filter(
+        author_id=recipe['author_id']
+    ).values_list('user_id', flat=True))
+    _insert(
+        FeedEntry(
+            user_id=user_id, recipe_id=recipe_id, pub_date=recipe['pub_date']
+        )
+        for user_id in followers
+    )
+    trim(followers)
+
+
+def backfill(user_id, author_id):
+    """
+    Добавляет в ленту новые рецепты автора при подписке.
+    """
+    if is_pulled(author_id):
+        return
+
+    _insert(
+        FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+        for recipe_id, pub_date in Recipe.objects.filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-id').values_list(
+            'id', 'pub_date'
+        )[:FEED_RETENTION]
+    )
+    trim([user_id])
+
+
+def unfollow(user_id, author_id):
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+
+
+def schedule_fan_out(recipe_id):
+    transaction.on_commit(lambda: fan_out(recipe_id))
+
+
+def schedule_backfill(user_id, author_id):
+    transaction.on_commit(lambda: backfill(user_id, author_id))
+
+
+def timeline(user, position, limit):
+    """
+    Возвращает id limit рецептов ленты, начиная после position
+    ((pub_date, id) последнего показанного рецепта): записи ленты
+    сливаются с рецептами плодовитых авторов, читаемыми напрямую.
+    Список таких авторов загружается заранее (пустой IN не выполняет
+    запрос), а их рецепты ограничиваются снизу датой последней записи
+    полной страницы ленты, чтобы не сортировать все рецепты авторов.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    pulled = Recipe.objects.filter(author_id__in=list(
+        CustomUser.objects.filter(
+            following__user=user, recipes_count__gt=FEED_PULL_RECIPES_COUNT
+        ).values_list('id', flat=True)
+    ))
+
+    if position is not None:
+        pub_date, pk = position
+        entries = entries.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, recipe_id__lt=pk)
+        )
+        pulled = pulled.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk)
+        )
+
+    rows = list(entries.order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id'
+    )[:limit])
+
+    if len(rows) == limit:
+        pulled = pulled.filter(pub_date__gte=rows[-1][0])
+
+    rows = set(rows)
+    rows.update(pulled.order_by('-pub_date', '-id').values_list(
+        'pub_date', 'id'
+    )[:limit])
+
+    return [pk for _, pk in sorted(rows, reverse=True)[:limit]]
+
+
+def rebuild():
+    """
+    Полностью пересобирает ленты всех подписчиков.
+    """
+    user_ids = list(Subscription.objects.order_by(
+        'user_id'
+    ).values_list('user_id', flat=True).distinct())
+    FeedEntry.objects.all().delete()
+
+    for user_id in user_ids:
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(
+                    user_id=user_id, recipe_id=recipe_id, pub_date=pub_date
+                )
+                for recipe_id, pub_date in Recipe.objects.filter(
+                    author__following__user_id=user_id,
+                    author__recipes_count__lte=FEED_PULL_RECIPES_COUNT
+                ).order_by('-pub_date', '-id').values_list(
+                    'id', 'pub_date'
+                )[:FEED_RETENTION]
+            ),
+            batch_size=FEED_BATCH_SIZE
+        )
+
+    return len(user_ids)
@@ -0,0 +1,120 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps
+
+from recipes.constants import (
+    IMAGE_JPEG_QUALITY,
+    IMAGE_VARIANTS,
+    IMAGE_VARIANTS_DIR,
+    IMAGE_WEBP_QUALITY
+)
+from recipes.models import Recipe
+from recipes.versions import bump_versions
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def variant_name(name, variant):
+    """
+    Имя JPEG-варианта картинки; WebP-вариант лежит рядом с суффиксом .webp,
+    чтобы nginx мог отдать его через try_files по заголовку Accept.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{IMAGE_VARIANTS_DIR}{stem}_{variant}.jpg'
+
+
+def _save(storage, name, image, format, quality):
+    buffer = BytesIO()
+    image.save(buffer, format=format, quality=quality, optimize=True)
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def _delete_variants(storage, name):
+    for variant in IMAGE_VARIANTS:
+        jpeg_name = variant_name(name, variant)
+        for file_name in (jpeg_name, f'{jpeg_name}.webp'):
+            if storage.exists(file_name):
+                storage.delete(file_name)
+
+
+def generate_variants(recipe_id):
+    """
+    Создает варианты картинки рецепта (JPEG и WebP) и отмечает рецепт,
+    если картинка не была заменена за время обработки.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'variants_source'
+    ).first()
+
+    if recipe is None or not recipe.image:
+        return False
+
+    name = recipe.image.name
+    storage = recipe.image.storage
+
+    with storage.open(name) as file:
+        source = ImageOps.exif_transpose(Image.open(file)).convert('RGB')
+
+    for variant, size in IMAGE_VARIANTS.items():
+        image = ImageOps.fit(source, size, Image.Resampling.LANCZOS)
+        jpeg_name = variant_name(name, variant)
+        _save(storage, jpeg_name, image, 'JPEG', IMAGE_JPEG_QUALITY)
+        _save(storage, f'{jpeg_name}.webp', image, 'WEBP', IMAGE_WEBP_QUALITY)
+
+    updated = Recipe.objects.filter(pk=recipe_id, image=name).update(
+        variants_source=name
+    )
+
+    if updated:
+        if recipe.variants_source and recipe.variants_source != name:
+            _delete_variants(storage, recipe.variants_source)
+        bump_versions('recipes', f'recipe:{recipe_id}')
+
+    return bool(updated)
+
+
+def _generate(recipe_id):
+    """
+    Ошибка обработки (битый или неподдерживаемый файл) только пишется
+    в лог: рецепт уже сохранен, и ответ на запрос от нее не зависит.
+    """
+    try:
+        generate_variants(recipe_id)
+    except Exception:
+        logger.exception('Не удалось создать варианты картинки %s', recipe_id)
+
+
+def _run(recipe_id):
+    try:
+        _generate(recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_variants(recipe_id):
+    """
+    Ставит обработку картинки в пул потоков процесса.
+    При IMAGE_VARIANT_WORKERS = 0 обработка выполняется сразу.
+    """
+    global _executor
+
+    if not settings.IMAGE_VARIANT_WORKERS:
+        _generate(recipe_id)
+        return
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix='image-variants'
+        )
+    _executor.submit(_run, recipe_id)
@@ -0,0 +1,68 @@
+import bisect
+import threading
+
+from recipes.constants import INGREDIENT_SEARCH_LIMIT
+from recipes.models import Ingredient
+from recipes.versions import get_versions
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Хранит отсортированный по названию массив и ищет префикс через bisect.
+    Снимок привязан к метке версии 'ingredients', по которой считается
+    и ETag списка ингредиентов: после фиксации изменений в любом процессе
+    метка меняется, и снимок перестраивается, поэтому под новым ETag
+    не отдаются старые данные.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._version = None
+
+    def _get_snapshot(self):
+        # Метка читается до построения: изменения, зафиксированные
+        # между чтением и построением, вызовут повторное построение.
+        version, = get_versions('ingredients')
+        if self._version != version:
+            with self._lock:
+                if self._version != version:
+                    self._snapshot = self._build()
+                    self._version = version
+        return self._snapshot
+
+    @staticmethod
+    def _build():
+        items = sorted(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            key=lambda item: (
+                item['name'].casefold(), item['measurement_unit'], item['id']
+            )
+        )
+        keys = [item['name'].casefold() for item in items]
+        return keys, items
+
+    def search(self, query, limit=INGREDIENT_SEARCH_LIMIT):
+        """
+        Возвращает не более limit ингредиентов: сначала точные совпадения,
+        затем совпадения по префиксу, затем по вхождению подстроки.
+        """
+        keys, items = self._get_snapshot()
+        query = query.casefold()
+
+        start = bisect.bisect_left(keys, query)
+        end = bisect.bisect_left(keys, query + chr(0x10FFFF), lo=start)
+        result = items[start:min(end, start + limit)]
+
+        for index, key in enumerate(keys):
+            if len(result) >= limit:
+                break
+            if query in key and not start <= index < end:
+                result.append(items[index])
+
+        return result
+
+
+ingredient_index = IngredientIndex()
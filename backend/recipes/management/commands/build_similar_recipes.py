@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import build, refresh
+
+
+class Command(BaseCommand):
+    help = 'Рассчитывает похожие рецепты по наборам ингредиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Пересчитать только рецепты, измененные после '
+                 'последнего расчета'
+        )
+
+    def handle(self, *args, **options):
+        recipes = refresh() if options['incremental'] else build()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты рассчитаны для {recipes} рецептов'
+        ))
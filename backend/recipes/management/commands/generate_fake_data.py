@@ -0,0 +1,221 @@
+import random
+import time
+import uuid
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.constants import MAX_COOKING_TIME, MIN_COOKING_TIME
+from recipes.counters import recount_counters
+from recipes.feed import rebuild as rebuild_feeds
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+)
+from recipes.shopping_list import rebuild as rebuild_shopping_lists
+from recipes.versions import bump_versions
+from users.models import CustomUser, Subscription
+
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+FAKE_PASSWORD = 'fake_password'
+FAKE_IMAGE = 'recipes/images/pepperoni.jpg'
+
+
+class ZipfSampler:
+    """
+    Выбор элементов с вероятностью, обратно пропорциональной рангу
+    в степени exponent: немногие элементы получают большую часть выборок.
+    """
+
+    def __init__(self, population, exponent):
+        self.population = list(population)
+        random.shuffle(self.population)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent
+            for rank in range(1, len(self.population) + 1)
+        ))
+
+    def sample(self, k=1):
+        return random.choices(
+            self.population, cum_weights=self.cum_weights, k=k
+        )
+
+    def sample_unique(self, k):
+        return set(self.sample(k))
+
+
+class Command(BaseCommand):
+    help = 'Создает синтетические данные для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=100000)
+        parser.add_argument('--carts', type=int, default=20000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, nargs=2, default=(3, 10),
+            metavar=('MIN', 'MAX')
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения Ципфа для популярности'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int)
+
+    def chunks(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def report(self, name, count, started):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{name}: {count} за {elapsed:.1f} с '
+            f'({count / elapsed if elapsed else count:.0f} строк/с)'
+        )
+
+    def create_users(self, total):
+        started = time.monotonic()
+        password = make_password(FAKE_PASSWORD)
+
+        for start, size in self.chunks(total):
+            CustomUser.objects.bulk_create([
+                CustomUser(
+                    email=f'{self.prefix}-{number}@example.com',
+                    username=f'{self.prefix}-{number}',
+                    first_name='Имя',
+                    last_name='Фамилия',
+                    password=password
+                )
+                for number in range(start, start + size)
+            ])
+
+        self.report('Пользователи', total, started)
+        return list(CustomUser.objects.values_list('id', flat=True))
+
+    @staticmethod
+    def get_tags():
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create([
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in DEFAULT_TAGS
+            ])
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_recipes(self, total, authors, tags, ingredients, amounts):
+        started = time.monotonic()
+        links = 0
+        tags_through = Recipe.tags.through
+
+        for start, size in self.chunks(total):
+            chunk_prefix = f'{self.prefix}-{start}-'
+            with transaction.atomic():
+                Recipe.objects.bulk_create([
+                    Recipe(
+                        name=f'{chunk_prefix}{number}',
+                        text='Синтетический рецепт. ' * random.randint(5, 50),
+                        image=FAKE_IMAGE,
+                        cooking_time=random.randint(
+                            MIN_COOKING_TIME, MAX_COOKING_TIME // 10
+                        ),
+                        author_id=author_id
+                    )
+                    for number, author_id in enumerate(authors.sample(size))
+                ])
+                recipe_ids = Recipe.objects.filter(
+                    name__startswith=chunk_prefix
+                ).values_list('id', flat=True)
+
+                recipe_ingredients = []
+                recipe_tags = []
+                for recipe_id in recipe_ids:
+                    recipe_ingredients.extend(
+                        IngredientInRecipe(
+                            recipe_id=recipe_id,
+                            ingredient_id=ingredient_id,
+                            amount=random.randint(1, 500)
+                        )
+                        for ingredient_id in ingredients.sample_unique(
+                            random.randint(*amounts)
+                        )
+                    )
+                    recipe_tags.extend(
+                        tags_through(recipe_id=recipe_id, tag_id=tag_id)
+                        for tag_id in random.sample(
+                            tags, random.randint(1, len(tags))
+                        )
+                    )
+
+                IngredientInRecipe.objects.bulk_create(recipe_ingredients)
+                tags_through.objects.bulk_create(recipe_tags)
+                links += len(recipe_ingredients)
+
+        self.report('Рецепты', total, started)
+        self.stdout.write(f'Ингредиенты в рецептах: {links}')
+
+    def create_pairs(self, name, model, total, users, targets, field):
+        started = time.monotonic()
+
+        for start, size in self.chunks(total):
+            model.objects.bulk_create(
+                [
+                    model(user_id=user_id, **{f'{field}_id': target_id})
+                    for user_id, target_id in zip(
+                        random.choices(users, k=size), targets.sample(size)
+                    )
+                    if user_id != target_id or field != 'author'
+                ],
+                ignore_conflicts=True
+            )
+
+        self.report(name, total, started)
+
+    def handle(self, *args, **options):
+        if options['seed'] is not None:
+            random.seed(options['seed'])
+
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not ingredient_ids:
+            raise CommandError('Сначала загрузите ингредиенты: upload')
+
+        self.batch_size = options['batch_size']
+        self.prefix = uuid.uuid4().hex[:8]
+        exponent = options['zipf']
+
+        users = self.create_users(options['users'])
+        authors = ZipfSampler(users, exponent)
+        self.create_recipes(
+            options['recipes'],
+            authors,
+            self.get_tags(),
+            ZipfSampler(ingredient_ids, exponent),
+            options['ingredients_per_recipe']
+        )
+
+        recipes = ZipfSampler(
+            Recipe.objects.values_list('id', flat=True), exponent
+        )
+        self.create_pairs(
+            'Избранное', Favorite, options['favorites'], users, recipes,
+            'recipe'
+        )
+        self.create_pairs(
+            'Списки покупок', ShoppingCart, options['carts'], users, recipes,
+            'recipe'
+        )
+        self.create_pairs(
+            'Подписки', Subscription, options['subscriptions'], users,
+            authors, 'author'
+        )
+
+        recount_counters()
+        rebuild_shopping_lists()
+        rebuild_feeds()
+        bump_versions('recipes', 'users', 'popularity')
+        self.stdout.write(self.style.SUCCESS('Данные успешно созданы!'))
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создает недостающие варианты картинок рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать варианты для всех рецептов'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Количество потоков обработки'
+        )
+
+    def _generate(self, recipe_id):
+        try:
+            return generate_variants(recipe_id)
+        except (OSError, ValueError) as error:
+            self.stderr.write(f'Рецепт {recipe_id}: {error}')
+            return False
+        finally:
+            connection.close()
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+
+        if not options['force']:
+            recipes = recipes.exclude(variants_source=F('image'))
+
+        recipe_ids = list(recipes.values_list('id', flat=True))
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            processed = sum(executor.map(self._generate, recipe_ids))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {processed} из {len(recipe_ids)}'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок пользователей'
+
+    def handle(self, *args, **options):
+        users = rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны для {users} пользователей'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.shopping_list import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает списки покупок пользователей по их корзинам'
+
+    def handle(self, *args, **options):
+        users = rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны для {users} пользователей'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики избранного, корзин и рецептов'
+
+    def handle(self, *args, **options):
+        recipes, users = recount_counters()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено рецептов: {recipes}, пользователей: {users}'
+        ))
@@ -1,30 +1,163 @@
 import csv
-import os
+import json
+import time
+from itertools import islice
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
 
-from recipes.models import Ingredient
+from recipes.models import Ingredient, Tag
+from recipes.versions import bump_versions
+
+CHUNK_SIZE = 64 * 1024
+JSON_SEPARATORS = '[], \t\r\n'
+
+
+def read_csv(path, fields):
+    """
+    Построчно читает CSV; первая строка пропускается, если это заголовок.
+    """
+    with open(path, encoding='UTF-8', newline='') as file:
+        reader = csv.reader(file)
+        for row in reader:
+            if row == fields:
+                continue
+            yield dict(zip(fields, row))
+
+
+def read_json(path):
+    """
+    Потоково читает JSON-массив объектов или JSON Lines, не загружая
+    файл в память целиком. Поддерживает фикстуры Django (ключ fields).
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+
+    with open(path, encoding='UTF-8') as file:
+        eof = False
+        while not eof:
+            chunk = file.read(CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            position = 0
+
+            while True:
+                while (
+                    position < len(buffer)
+                    and buffer[position] in JSON_SEPARATORS
+                ):
+                    position += 1
+                if position == len(buffer):
+                    break
+                try:
+                    item, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    break
+                yield item.get('fields', item)
+
+            buffer = buffer[position:]
 
 
 class Command(BaseCommand):
-    _file_path = os.path.join('data', 'ingredients.csv')
+    help = 'Импортирует или обновляет ингредиенты и теги из CSV и JSON'
+    models = {
+        'ingredients': (Ingredient, ['name', 'measurement_unit']),
+        'tags': (Tag, ['name', 'color', 'slug']),
+    }
+    default_paths = {
+        'ingredients': settings.BASE_DIR / 'data' / 'ingredients.csv',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Файлы .csv, .json или .jsonl'
+        )
+        parser.add_argument(
+            '--model', choices=self.models, default='ingredients',
+            help='Что импортировать'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество записей в одном запросе'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только проверить данные, ничего не записывая'
+        )
+
+    def read(self, path, fields):
+        path = Path(path)
+        if not path.exists():
+            raise CommandError(f'Файл не найден: {path}')
+        if path.suffix == '.csv':
+            return read_csv(path, fields)
+        if path.suffix in ('.json', '.jsonl'):
+            return read_json(path)
+        raise CommandError(f'Неподдерживаемый формат: {path}')
+
+    def build(self, model, fields, rows):
+        for row in rows:
+            instance = model(**{
+                field: str(row.get(field, '')).strip() for field in fields
+            })
+            try:
+                instance.clean_fields()
+            except ValidationError as error:
+                self.skipped += 1
+                self.stderr.write(f'Пропущено {row}: {error.messages}')
+                continue
+            yield instance
+
+    @staticmethod
+    def save_ingredients(batch):
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+
+    @staticmethod
+    def save_tags(batch):
+        for tag in batch:
+            Tag.objects.update_or_create(
+                slug=tag.slug, defaults={'name': tag.name, 'color': tag.color}
+            )
 
     def handle(self, *args, **options):
-        if Ingredient.objects.exists():
-            self.stdout.write(self.style.WARNING('Данные уже существуют'))
-            return
+        model_name = options['model']
+        model, fields = self.models[model_name]
+        paths = options['paths'] or [self.default_paths.get(model_name)]
 
-        with open(self._file_path, encoding='UTF-8') as file:
-            reader = csv.reader(file)
-            next(reader)
+        if None in paths:
+            raise CommandError('Укажите файл для импорта')
 
-            ingredients = [
-                Ingredient(name=name, measurement_unit=measurement_unit)
-                for name, measurement_unit in reader
-            ]
+        save = getattr(self, f'save_{model_name}')
+        self.skipped = 0
+        processed = 0
+        existed = model.objects.count()
+        started = time.monotonic()
 
-            Ingredient.objects.bulk_create(ingredients)
+        for path in paths:
+            instances = self.build(model, fields, self.read(path, fields))
+            while True:
+                batch = list(islice(instances, options['batch_size']))
+                if not batch:
+                    break
+                if not options['dry_run']:
+                    save(batch)
+                processed += len(batch)
 
-        self.stdout.write(
-            self.style.SUCCESS('Данные успешно импортированы!')
-        )
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else processed
+
+        if not options['dry_run']:
+            bump_versions(model_name)
+
+        created = model.objects.count() - existed
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано: {processed}, новых: {created}, '
+            f'пропущено: {self.skipped} '
+            f'за {elapsed:.1f} с ({rate:.0f} строк/с)'
+            + (' [dry-run]' if options['dry_run'] else '')
+        ))
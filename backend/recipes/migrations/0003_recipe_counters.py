@@ -0,0 +1,60 @@
+# Generated by Django 3.2 on 2026-10-18 02:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    recipe_model = apps.get_model('recipes', 'Recipe')
+    recipe_model.objects.update(
+        favorites_count=count(
+            apps.get_model('recipes', 'Favorite'), 'recipe'
+        ),
+        in_carts_count=count(
+            apps.get_model('recipes', 'ShoppingCart'), 'recipe'
+        )
+    )
+    apps.get_model('users', 'CustomUser').objects.update(
+        recipes_count=count(recipe_model, 'author')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_alter_ingredientinrecipe_amount'),
+        ('users', '0006_customuser_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлено в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлено в список покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-in_carts_count', '-pub_date'], name='recipe_in_carts_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
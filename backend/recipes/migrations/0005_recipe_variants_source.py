@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='variants_source',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Картинка, для которой созданы варианты'),
+        ),
+    ]
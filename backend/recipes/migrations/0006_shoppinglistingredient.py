@@ -0,0 +1,56 @@
+# Generated by Django 3.2 on 2026-10-18 02:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def fill_shopping_lists(apps, schema_editor):
+    item_model = apps.get_model('recipes', 'ShoppingListIngredient')
+    link_model = apps.get_model('recipes', 'IngredientInRecipe')
+
+    item_model.objects.bulk_create(
+        (
+            item_model(
+                user_id=row['recipe__shopping_carts__user_id'],
+                ingredient_id=row['ingredient_id'],
+                total_amount=row['total']
+            )
+            for row in link_model.objects.filter(
+                recipe__shopping_carts__isnull=False
+            ).values(
+                'recipe__shopping_carts__user_id', 'ingredient_id'
+            ).annotate(total=Sum('amount')).order_by().iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_recipe_variants_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент списка покупок',
+                'verbose_name_plural': 'Ингредиенты списка покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='shopping_list_unique'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 3.2 on 2026-10-18 02:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Значения FEED_PULL_RECIPES_COUNT и FEED_RETENTION на момент миграции.
+PULL_RECIPES_COUNT = 200
+RETENTION = 500
+
+
+def fill_feeds(apps, schema_editor):
+    entry_model = apps.get_model('recipes', 'FeedEntry')
+    recipe_model = apps.get_model('recipes', 'Recipe')
+    subscription_model = apps.get_model('users', 'Subscription')
+
+    user_ids = subscription_model.objects.order_by(
+        'user_id'
+    ).values_list('user_id', flat=True).distinct()
+
+    for user_id in user_ids.iterator():
+        entry_model.objects.bulk_create(
+            (
+                entry_model(
+                    user_id=user_id, recipe_id=recipe_id, pub_date=pub_date
+                )
+                for recipe_id, pub_date in recipe_model.objects.filter(
+                    author__following__user_id=user_id,
+                    author__recipes_count__lte=PULL_RECIPES_COUNT
+                ).order_by('-pub_date', '-id').values_list(
+                    'id', 'pub_date'
+                )[:RETENTION]
+            ),
+            batch_size=1000
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0006_shoppinglistingredient'),
+        ('users', '0006_customuser_recipes_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddField(
+            model_name='feedentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_entry_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='feed_entry_unique'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+from django.db import migrations
+
+POSTGRES_SQL = (
+    'ALTER TABLE recipes_recipe '
+    'ADD COLUMN IF NOT EXISTS search_vector tsvector '
+    'GENERATED ALWAYS AS ('
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') "
+    "|| setweight(to_tsvector('russian', coalesce(text, '')), 'B')"
+    ') STORED',
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+    'ON recipes_recipe '
+    'USING GIN (search_vector)',
+)
+POSTGRES_REVERSE_SQL = (
+    'ALTER TABLE recipes_recipe DROP COLUMN search_vector',
+)
+SQLITE_SQL = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5('
+    "name, text, content='recipes_recipe', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'CREATE TRIGGER recipes_recipe_fts_insert AFTER INSERT '
+    'ON recipes_recipe '
+    'BEGIN INSERT INTO recipes_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER recipes_recipe_fts_delete AFTER DELETE '
+    'ON recipes_recipe '
+    'BEGIN INSERT INTO recipes_recipe_fts'
+    '(recipes_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    'CREATE TRIGGER recipes_recipe_fts_update AFTER UPDATE OF name, text '
+    'ON recipes_recipe '
+    'BEGIN INSERT INTO recipes_recipe_fts'
+    '(recipes_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO recipes_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) VALUES ('rebuild')",
+)
+SQLITE_REVERSE_SQL = (
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def execute(schema_editor, statements):
+    vendor = schema_editor.connection.vendor
+
+    for sql in statements.get(vendor, ()):
+        schema_editor.execute(sql)
+
+
+def install_search(apps, schema_editor):
+    execute(schema_editor, {
+        'postgresql': POSTGRES_SQL,
+        'sqlite': SQLITE_SQL,
+    })
+
+
+def uninstall_search(apps, schema_editor):
+    execute(schema_editor, {
+        'postgresql': POSTGRES_REVERSE_SQL,
+        'sqlite': SQLITE_REVERSE_SQL,
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
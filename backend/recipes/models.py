@@ -72,6 +72,12 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Картинка', upload_to='recipes/images/'
     )
+    variants_source = models.CharField(
+        verbose_name='Картинка, для которой созданы варианты',
+        max_length=100,
+        blank=True,
+        editable=False
+    )
     tags = models.ManyToManyField(Tag, verbose_name='Теги')
     ingredients = models.ManyToManyField(
         Ingredient, through='IngredientInRecipe', verbose_name='Ингредиенты'
@@ -98,11 +104,38 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации', auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения', auto_now=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлено в избранное', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Добавлено в список покупок', default=0, editable=False
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date'],
+                name='recipe_favorites_count_idx'
+            ),
+            models.Index(
+                fields=['-in_carts_count', '-pub_date'],
+                name='recipe_in_carts_count_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -202,3 +235,103 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe.name} - добавлено в список покупок'
+
+
+class ShoppingListIngredient(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.IntegerField(verbose_name='Количество')
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='shopping_list_unique'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient.name}'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='feed_entry_unique'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+    computed_at = models.DateTimeField(verbose_name='Дата расчета')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='similar_recipe_unique'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['recipe', '-score'],
+                name='similar_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}'
@@ -0,0 +1,69 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+RECIPE_TABLE = 'recipes_recipe'
+FTS_TABLE = 'recipes_recipe_fts'
+
+# Поисковый индекс (колонка tsvector в PostgreSQL, таблица FTS5
+# с триггерами в SQLite) создается миграцией recipes 0008.
+
+
+def _fts_query(value):
+    """
+    Запрос FTS5 из слов строки: каждое слово ищется как префикс,
+    что отчасти заменяет стемминг; спецсимволы синтаксиса отбрасываются.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', value))
+
+
+def search(queryset, value):
+    """
+    Оставляет рецепты, подходящие под запрос value, и сортирует их
+    по релевантности (аннотация search_rank). Модуль поиска PostgreSQL
+    импортируется здесь: он требует psycopg2, которого может не быть
+    при локальном запуске на SQLite. Таблица FTS5 присоединяется через
+    extra(): функция bm25 доступна только в запросе с MATCH,
+    а коррелированный подзапрос повторял бы поиск для каждой строки.
+    """
+    vendor = connections[queryset.db].vendor
+
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVectorField
+        )
+
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        vector = RawSQL(
+            f'{RECIPE_TABLE}.search_vector', (),
+            output_field=SearchVectorField()
+        )
+        queryset = queryset.alias(search_vector=vector).filter(
+            search_vector=query
+        ).annotate(search_rank=SearchRank(vector, query))
+    elif vendor == 'sqlite':
+        query = _fts_query(value)
+
+        if not query:
+            return queryset.none()
+
+        queryset = queryset.extra(
+            select={'search_rank': f'-bm25({FTS_TABLE}, 10.0, 1.0)'},
+            tables=[FTS_TABLE],
+            where=[
+                f'{FTS_TABLE} MATCH %s',
+                f'{FTS_TABLE}.rowid = {RECIPE_TABLE}.id'
+            ],
+            params=[query]
+        )
+    else:
+        queryset = queryset.filter(
+            Q(name__icontains=value) | Q(text__icontains=value)
+        ).annotate(search_rank=RawSQL('0', (), output_field=FloatField()))
+
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
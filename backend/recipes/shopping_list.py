@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from recipes.models import (
+    IngredientInRecipe, ShoppingCart, ShoppingListIngredient
+)
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def ingredient_amounts(recipe_ids):
+    """
+    Суммарное количество каждого ингредиента в рецептах recipe_ids.
+    """
+    return dict(IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('ingredient_id').annotate(
+        total=Sum('amount')
+    ).values_list('ingredient_id', 'total'))
+
+
+def carting_users(recipe_id):
+    return list(ShoppingCart.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('user_id', flat=True))
+
+
+@transaction.atomic
+def apply_deltas(user_ids, deltas):
+    """
+    Изменяет списки покупок пользователей user_ids на deltas
+    ({ingredient_id: изменение количества}) одним UPDATE с F().
+    """
+    deltas = {key: value for key, value in deltas.items() if value}
+
+    if not user_ids or not deltas:
+        return
+
+    ShoppingListIngredient.objects.bulk_create(
+        [
+            ShoppingListIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, total_amount=0
+            )
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items()
+            if delta > 0
+        ],
+        ignore_conflicts=True
+    )
+
+    items = ShoppingListIngredient.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=deltas
+    )
+    items.update(total_amount=F('total_amount') + Case(
+        *(When(ingredient_id=key, then=Value(value))
+          for key, value in deltas.items()),
+        default=Value(0)
+    ))
+
+    if any(delta < 0 for delta in deltas.values()):
+        items.filter(total_amount__lte=0).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], ingredient_amounts(recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    apply_deltas([user_id], {
+        key: -value for key, value in ingredient_amounts(recipe_ids).items()
+    })
+
+
+def change_recipe(recipe_id, deltas):
+    """
+    Применяет изменение состава рецепта к спискам покупок пользователей,
+    у которых он в корзине.
+    """
+    apply_deltas(carting_users(recipe_id), deltas)
+
+
+def recompute(user_ids, ingredient_ids=None):
+    """
+    Пересчитывает строки списков покупок по фактическим данным корзин.
+    """
+    items = ShoppingListIngredient.objects.filter(user_id__in=user_ids)
+    links = IngredientInRecipe.objects.filter(
+        recipe__shopping_carts__user_id__in=user_ids
+    )
+    if ingredient_ids is not None:
+        items = items.filter(ingredient_id__in=ingredient_ids)
+        links = links.filter(ingredient_id__in=ingredient_ids)
+
+    with transaction.atomic():
+        items.delete()
+        ShoppingListIngredient.objects.bulk_create(
+            ShoppingListIngredient(
+                user_id=row['recipe__shopping_carts__user_id'],
+                ingredient_id=row['ingredient_id'],
+                total_amount=row['total']
+            )
+            for row in links.values(
+                'recipe__shopping_carts__user_id', 'ingredient_id'
+            ).annotate(total=Sum('amount')).order_by()
+        )
+
+
+def schedule_recompute(user_ids, ingredient_ids):
+    """
+    Пересчет после фиксации транзакции: используется там, где дельту
+    вычислить нельзя (правка в админке, каскадное удаление рецепта).
+    """
+    user_ids, ingredient_ids = set(user_ids), set(ingredient_ids)
+
+    if user_ids and ingredient_ids:
+        transaction.on_commit(lambda: recompute(user_ids, ingredient_ids))
+
+
+def rebuild():
+    """
+    Полностью пересобирает списки покупок всех пользователей.
+    """
+    carts = ShoppingCart.objects.order_by('user_id')
+    user_ids = list(carts.values_list('user_id', flat=True).distinct())
+    ShoppingListIngredient.objects.exclude(
+        user_id__in=carts.values('user_id')
+    ).delete()
+
+    for start in range(0, len(user_ids), REBUILD_BATCH_SIZE):
+        recompute(user_ids[start:start + REBUILD_BATCH_SIZE])
+
+    return len(user_ids)
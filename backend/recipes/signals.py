@@ -0,0 +1,142 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from recipes.counters import update_counter
+from recipes.feed import schedule_backfill, schedule_fan_out, unfollow
+from recipes.images import schedule_variants
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+)
+from recipes.shopping_list import (
+    add_recipes, carting_users, remove_recipes, schedule_recompute
+)
+from recipes.versions import bump_versions
+from users.models import CustomUser, Subscription
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    bump_versions('ingredients')
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def bump_tags_version(**kwargs):
+    bump_versions('tags')
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def bump_recipe_version(instance, **kwargs):
+    bump_versions('recipes', f'recipe:{instance.pk}')
+
+
+@receiver(post_save, sender=Recipe)
+def create_image_variants(instance, **kwargs):
+    if instance.image and instance.variants_source != instance.image.name:
+        transaction.on_commit(lambda: schedule_variants(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=IngredientInRecipe)
+def bump_recipe_ingredients_version(instance, **kwargs):
+    bump_versions('recipes', f'recipe:{instance.recipe_id}')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_recipe_relations_version(instance, action, reverse, pk_set,
+                                  **kwargs):
+    if not action.startswith('post_'):
+        return
+
+    if not reverse:
+        pk_set = {instance.pk}
+
+    bump_versions('recipes', *(f'recipe:{pk}' for pk in pk_set or ()))
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@receiver([post_save, post_delete], sender=Subscription)
+def bump_user_version(instance, **kwargs):
+    bump_versions(f'user:{instance.user_id}')
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def bump_users_version(instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+
+    bump_versions('users', f'author:{instance.pk}')
+
+
+def _connect_counter(sender, model, fk_name, field):
+    def increment(instance, created, **kwargs):
+        if created:
+            update_counter(model, getattr(instance, fk_name), field, 1)
+
+    def decrement(instance, **kwargs):
+        update_counter(model, getattr(instance, fk_name), field, -1)
+
+    uid = f'{sender.__name__}.{field}'
+    post_save.connect(
+        increment, sender=sender, weak=False, dispatch_uid=f'{uid}+'
+    )
+    post_delete.connect(
+        decrement, sender=sender, weak=False, dispatch_uid=f'{uid}-'
+    )
+
+
+_connect_counter(Favorite, Recipe, 'recipe_id', 'favorites_count')
+_connect_counter(ShoppingCart, Recipe, 'recipe_id', 'in_carts_count')
+_connect_counter(Recipe, CustomUser, 'author_id', 'recipes_count')
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def bump_popularity_version(**kwargs):
+    bump_versions('popularity')
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(instance, created, **kwargs):
+    if created:
+        add_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    remove_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Recipe)
+def recompute_shopping_lists_for_recipe(instance, **kwargs):
+    schedule_recompute(
+        carting_users(instance.pk),
+        instance.recipe_ingredient.values_list('ingredient_id', flat=True)
+    )
+
+
+@receiver([post_save, post_delete], sender=IngredientInRecipe)
+def recompute_shopping_lists_for_ingredient(instance, **kwargs):
+    schedule_recompute(
+        carting_users(instance.recipe_id), [instance.ingredient_id]
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_to_feeds(instance, created, **kwargs):
+    if created:
+        schedule_fan_out(instance.pk)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(instance, created, **kwargs):
+    if created:
+        schedule_backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_feed(instance, **kwargs):
+    unfollow(instance.user_id, instance.author_id)
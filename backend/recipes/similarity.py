@@ -0,0 +1,245 @@
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from scipy import sparse
+
+from recipes.constants import SIMILAR_RECIPES_COUNT
+from recipes.models import IngredientInRecipe, Recipe, SimilarRecipe
+
+SIMILARITY_BLOCK_CELLS = 10_000_000
+SIMILARITY_BATCH_SIZE = 1000
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), SIMILARITY_BATCH_SIZE):
+        yield ids[start:start + SIMILARITY_BATCH_SIZE]
+
+
+def load_matrix():
+    """
+    Возвращает id рецептов и бинарную разреженную матрицу
+    рецепт × ингредиент: строка i описывает рецепт recipe_ids[i].
+    Рецепты без ингредиентов в матрицу не попадают.
+    """
+    pairs = np.fromiter(
+        chain.from_iterable(
+            IngredientInRecipe.objects.values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator(chunk_size=SIMILARITY_BATCH_SIZE * 10)
+        ),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    recipe_ids, rows = np.unique(pairs[:, 0], return_inverse=True)
+    ingredient_ids, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (rows, columns)),
+        shape=(len(recipe_ids), len(ingredient_ids))
+    )
+    return recipe_ids, matrix
+
+
+def blocks(rows, total):
+    """
+    Делит строки rows на блоки так, чтобы плотный блок сходств со всеми
+    total рецептами занимал не больше SIMILARITY_BLOCK_CELLS ячеек:
+    память на блок не растет с числом рецептов, растет число блоков.
+    """
+    size = max(1, SIMILARITY_BLOCK_CELLS // max(1, total))
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def jaccard(matrix, transposed, rows):
+    """
+    Плотный блок сходств Жаккара строк rows со всеми строками матрицы:
+    пересечение множеств ингредиентов считается произведением матрицы
+    на заранее транспонированную transposed, объединение — через
+    размеры множеств. Сходство рецепта с самим собой обнуляется.
+    """
+    sizes = matrix.getnnz(axis=1).astype(np.float32)
+    scores = (matrix[rows] @ transposed).toarray()
+    scores /= sizes[rows, None] + sizes[None, :] - scores
+    scores[np.arange(len(rows)), rows] = 0
+    return scores
+
+
+def top_neighbours(scores, count=SIMILAR_RECIPES_COUNT):
+    """
+    Для каждой строки блока возвращает индексы и сходства count
+    ближайших соседей по убыванию сходства.
+    """
+    count = min(count, scores.shape[1])
+    top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    return (
+        np.take_along_axis(top, order, axis=1),
+        np.take_along_axis(top_scores, order, axis=1)
+    )
+
+
+def top_per_recipe(recipes, similar, scores, count=SIMILAR_RECIPES_COUNT):
+    """
+    Оставляет для каждого рецепта из recipes не более count пар
+    с наибольшим сходством.
+    """
+    order = np.lexsort((-scores, recipes))
+    recipes, similar, scores = recipes[order], similar[order], scores[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(recipes)) + 1]
+    lengths = np.diff(np.r_[starts, len(recipes)])
+    ranks = np.arange(len(recipes)) - np.repeat(starts, lengths)
+    keep = ranks < count
+    return recipes[keep], similar[keep], scores[keep]
+
+
+def _store(recipes, similar, scores, computed_at):
+    SimilarRecipe.objects.bulk_create(
+        (
+            SimilarRecipe(
+                recipe_id=recipe_id,
+                similar_id=similar_id,
+                score=score,
+                computed_at=computed_at
+            )
+            for recipe_id, similar_id, score in zip(
+                recipes.tolist(), similar.tolist(), scores.tolist()
+            )
+            if score > 0
+        ),
+        batch_size=SIMILARITY_BATCH_SIZE
+    )
+
+
+def _store_block(recipe_ids, rows, neighbours, scores, computed_at):
+    _store(
+        np.repeat(recipe_ids[rows], neighbours.shape[1]),
+        recipe_ids[neighbours].ravel(),
+        scores.ravel(),
+        computed_at
+    )
+
+
+def build():
+    """
+    Полностью пересчитывает таблицу похожих рецептов: для каждого
+    рецепта сохраняется SIMILAR_RECIPES_COUNT соседей с наибольшим
+    сходством Жаккара по наборам ингредиентов. Матрица сходств
+    считается блоками (см. blocks), чтобы не держать в памяти
+    квадратную матрицу по всем рецептам.
+    """
+    computed_at = timezone.now()
+    recipe_ids, matrix = load_matrix()
+    transposed = matrix.T.tocsr()
+
+    with transaction.atomic():
+        SimilarRecipe.objects.all().delete()
+
+        for rows in blocks(np.arange(len(recipe_ids)), len(recipe_ids)):
+            neighbours, scores = top_neighbours(
+                jaccard(matrix, transposed, rows)
+            )
+            _store_block(recipe_ids, rows, neighbours, scores, computed_at)
+
+    return len(recipe_ids)
+
+
+def refresh():
+    """
+    Обновляет таблицу для рецептов, измененных после последнего расчета.
+    Списки измененных рецептов пересчитываются целиком, а в списки
+    остальных подмешиваются новые сходства с измененными рецептами.
+    Место соседа, который после изменения стал менее похож, заполнить
+    без полного расчета нельзя, поэтому такие списки могут оказаться
+    короче SIMILAR_RECIPES_COUNT до следующего запуска build().
+    Если таблица пуста, выполняется полный расчет.
+    """
+    last_build = SimilarRecipe.objects.aggregate(
+        last=Max('computed_at')
+    )['last']
+
+    if last_build is None:
+        return build()
+
+    computed_at = timezone.now()
+    changed_ids = np.array(
+        Recipe.objects.filter(updated_at__gt=last_build).values_list(
+            'id', flat=True
+        ),
+        dtype=np.int64
+    )
+
+    if not len(changed_ids):
+        return 0
+
+    recipe_ids, matrix = load_matrix()
+    transposed = matrix.T.tocsr()
+    is_changed = np.isin(recipe_ids, changed_ids)
+    changed_rows = np.flatnonzero(is_changed)
+
+    stale = set()
+    for chunk in _chunks(changed_ids.tolist()):
+        stale.update(SimilarRecipe.objects.filter(
+            similar_id__in=chunk
+        ).values_list('recipe_id', flat=True))
+    stale.difference_update(changed_ids.tolist())
+
+    floor = np.zeros(len(recipe_ids), dtype=np.float32)
+    full = np.array(list(SimilarRecipe.objects.values('recipe_id').annotate(
+        size=Count('id'), floor=Min('score')
+    ).filter(size__gte=SIMILAR_RECIPES_COUNT).values_list(
+        'recipe_id', 'floor'
+    )), dtype=np.float64).reshape(-1, 2)
+    full_ids = full[:, 0].astype(np.int64)
+    known = np.isin(full_ids, recipe_ids)
+    floor[np.searchsorted(recipe_ids, full_ids[known])] = full[known, 1]
+    floor[np.isin(recipe_ids, list(stale))] = 0
+
+    candidates = []
+    with transaction.atomic():
+        for chunk in _chunks(changed_ids.tolist()):
+            SimilarRecipe.objects.filter(recipe_id__in=chunk).delete()
+
+        for rows in blocks(changed_rows, len(recipe_ids)):
+            scores = jaccard(matrix, transposed, rows)
+            neighbours, top_scores = top_neighbours(scores)
+            _store_block(
+                recipe_ids, rows, neighbours, top_scores, computed_at
+            )
+
+            scores[:, is_changed] = 0
+            block, others = np.nonzero(scores > floor[None, :])
+            candidates.append((
+                recipe_ids[others],
+                recipe_ids[rows[block]],
+                scores[block, others]
+            ))
+
+        affected = stale.union(*(
+            recipes.tolist() for recipes, _, _ in candidates
+        ))
+        current = []
+        for chunk in _chunks(affected):
+            current.extend(SimilarRecipe.objects.filter(
+                recipe_id__in=chunk
+            ).values_list('recipe_id', 'similar_id', 'score'))
+            SimilarRecipe.objects.filter(recipe_id__in=chunk).delete()
+
+        current = np.array(current, dtype=np.float64).reshape(-1, 3)
+        current = current[~np.isin(current[:, 1], changed_ids)]
+        candidates.append((
+            current[:, 0].astype(np.int64),
+            current[:, 1].astype(np.int64),
+            current[:, 2]
+        ))
+        _store(
+            *top_per_recipe(*(
+                np.concatenate(column) for column in zip(*candidates)
+            )),
+            computed_at
+        )
+
+    return len(changed_ids)
@@ -0,0 +1,41 @@
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = 'version:{}'
+VERSION_CACHE = 'versions'
+EPOCH_KEY = VERSION_KEY.format('*')
+
+
+def get_versions(*names):
+    """
+    Возвращает метки версий коллекций в порядке names.
+    Метки коллекций создает только bump_versions: для коллекции, которая
+    еще не менялась, возвращается общая метка-эпоха, поэтому чтение
+    (в том числе по несуществующему id) не пишет в кеш по ключу на имя.
+    """
+    cache = caches[VERSION_CACHE]
+    keys = [VERSION_KEY.format(name) for name in names]
+    versions = cache.get_many([*keys, EPOCH_KEY])
+    epoch = versions.get(EPOCH_KEY)
+
+    if epoch is None and any(key not in versions for key in keys):
+        epoch = time.time()
+        if not cache.add(EPOCH_KEY, epoch, timeout=None):
+            epoch = cache.get(EPOCH_KEY, epoch)
+
+    return [versions.get(key, epoch) for key in keys]
+
+
+def bump_versions(*names):
+    """
+    Обновляет метки версий после фиксации текущей транзакции,
+    чтобы читатели не закешировали незафиксированное состояние.
+    """
+    keys = [VERSION_KEY.format(name) for name in names]
+    transaction.on_commit(
+        lambda: caches[VERSION_CACHE].set_many(
+            {key: time.time() for key in keys}, timeout=None
+        )
+    )
@@ -6,7 +6,8 @@ from users.models import CustomUser, Subscription
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
-    list_display = ('email', 'username', 'first_name', 'last_name')
+    list_display = ('email', 'username', 'first_name', 'last_name',
+                    'recipes_count')
     list_filter = ('first_name', 'last_name')
     search_fields = ('email', 'username')
 
@@ -26,6 +26,9 @@ class CustomUser(AbstractUser):
         verbose_name='Фамилия',
         max_length=USER_FIELD_LEN
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов', default=0, editable=False
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 